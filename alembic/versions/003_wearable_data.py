@@ -1,4 +1,4 @@
-"""Wearable data with TimescaleDB
+"""Wearable data with TimescaleDB (or monthly partitions on plain PostgreSQL)
 
 Revision ID: 003_wearable_data
 Revises: 002_fhir_abdm
@@ -15,7 +15,128 @@ branch_labels = None
 depends_on = None
 
 
+def has_timescaledb() -> bool:
+    return op.get_bind().execute(
+        sa.text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb')")
+    ).scalar()
+
+
+# Plain PostgreSQL fallback: wearable_data is range-partitioned by month and
+# wearable_daily_avg is an ordinary table kept up to date by
+# wearable_daily_refresh(). Table and column names match the TimescaleDB
+# layout so application queries are the same on both.
+
+# Creates missing monthly partitions from `from_month` up to `months_ahead`
+# months past the current month. Idempotent; returns the number created.
+CREATE_PARTITIONS_FN = """
+CREATE OR REPLACE FUNCTION wearable_data_create_partitions(from_month date, months_ahead integer)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    month_start date := date_trunc('month', from_month)::date;
+    stop_month date := (date_trunc('month', now()) + make_interval(months => months_ahead + 1))::date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start < stop_month LOOP
+        partition_name := format('wearable_data_%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF wearable_data FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start::timestamp AT TIME ZONE 'UTC',
+                (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END
+$$;
+"""
+
+# Recomputes the daily rollup for every UTC day lying wholly inside
+# [window_start, window_end); NULL bounds are unbounded. Same contract as
+# refresh_continuous_aggregate, and day buckets equal time_bucket('1 day').
+DAILY_REFRESH_FN = """
+CREATE OR REPLACE FUNCTION wearable_daily_refresh(window_start timestamptz, window_end timestamptz)
+RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    first_day timestamptz := date_trunc('day', coalesce(window_start, '-infinity'), 'UTC');
+    stop_day timestamptz := date_trunc('day', coalesce(window_end, 'infinity'), 'UTC');
+BEGIN
+    IF first_day < window_start THEN
+        first_day := first_day + interval '1 day';
+    END IF;
+    IF first_day >= stop_day THEN
+        RETURN;
+    END IF;
+
+    -- Concurrent refreshes of overlapping days would collide on the primary key
+    PERFORM pg_advisory_xact_lock(hashtext('wearable_daily_refresh'));
+
+    DELETE FROM wearable_daily_avg WHERE day >= first_day AND day < stop_day;
+    INSERT INTO wearable_daily_avg (patient_id, device_type, metric_type, day, avg_value, min_value, max_value, data_points)
+    SELECT patient_id, device_type, metric_type, date_trunc('day', time, 'UTC'),
+           avg(value), min(value), max(value), count(*)
+    FROM wearable_data
+    WHERE time >= first_day AND time < stop_day
+    GROUP BY 1, 2, 3, 4;
+END
+$$;
+"""
+
+
+def upgrade_partitioned() -> None:
+    op.create_table(
+        'wearable_data',
+        sa.Column('time', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('patient_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('patients.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('device_type', sa.String(50), nullable=False),
+        sa.Column('metric_type', sa.String(50), nullable=False),
+        sa.Column('value', sa.Numeric(), nullable=True),
+        sa.Column('unit', sa.String(20), nullable=True),
+        sa.Column('metadata', postgresql.JSONB(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        postgresql_partition_by='RANGE (time)'
+    )
+
+    # Safety net for rows outside any monthly partition; stays empty in normal operation
+    op.execute('CREATE TABLE wearable_data_default PARTITION OF wearable_data DEFAULT')
+    op.execute(CREATE_PARTITIONS_FN)
+    op.execute("SELECT wearable_data_create_partitions((current_date - interval '6 months')::date, 3)")
+
+    op.create_index('idx_wearable_patient_time', 'wearable_data', ['patient_id', 'time'], postgresql_using='btree')
+    op.create_index('idx_wearable_metric_type', 'wearable_data', ['metric_type'])
+
+    op.create_table(
+        'wearable_daily_avg',
+        sa.Column('patient_id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('device_type', sa.String(50), primary_key=True),
+        sa.Column('metric_type', sa.String(50), primary_key=True),
+        sa.Column('day', sa.DateTime(timezone=True), primary_key=True),
+        sa.Column('avg_value', sa.Numeric(), nullable=True),
+        sa.Column('min_value', sa.Numeric(), nullable=True),
+        sa.Column('max_value', sa.Numeric(), nullable=True),
+        sa.Column('data_points', sa.BigInteger(), nullable=False),
+    )
+    op.execute(DAILY_REFRESH_FN)
+
+
+def downgrade_partitioned() -> None:
+    op.execute('DROP FUNCTION IF EXISTS wearable_daily_refresh(timestamptz, timestamptz)')
+    op.drop_table('wearable_daily_avg')
+    op.execute('DROP FUNCTION IF EXISTS wearable_data_create_partitions(date, integer)')
+    op.execute('DROP TABLE wearable_data CASCADE')
+
+
 def upgrade() -> None:
+    if not has_timescaledb():
+        upgrade_partitioned()
+        return
+
     # Enable TimescaleDB extension (requires superuser or pre-enabled)
     # op.execute('CREATE EXTENSION IF NOT EXISTS timescaledb')
     
@@ -70,6 +191,9 @@ def upgrade() -> None:
 
 
 def downgrade() -> None:
+    if not has_timescaledb():
+        downgrade_partitioned()
+        return
     # Remove continuous aggregate
     op.execute("DROP MATERIALIZED VIEW IF EXISTS wearable_daily_avg")
     
@@ -0,0 +1,161 @@
+"""Monthly range partitions for audit_logs with BRIN index and retention
+
+Revision ID: 004_partition_audit_logs
+Revises: 003_wearable_data
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '004_partition_audit_logs'
+down_revision = '003_wearable_data'
+branch_labels = None
+depends_on = None
+
+
+# Creates missing monthly partitions from `from_month` up to `months_ahead`
+# months past the current month. Idempotent; returns the number created.
+CREATE_PARTITIONS_FN = """
+CREATE OR REPLACE FUNCTION audit_logs_create_partitions(from_month date, months_ahead integer)
+RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    month_start date := date_trunc('month', from_month)::date;
+    stop_month date := (date_trunc('month', now()) + make_interval(months => months_ahead + 1))::date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    WHILE month_start < stop_month LOOP
+        partition_name := format('audit_logs_%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF audit_logs FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start::timestamp AT TIME ZONE 'UTC',
+                (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END
+$$;
+"""
+
+# Detaches partitions that ended before the retention cutoff. Detached
+# partitions are moved to the audit_archive schema (for dump/offload) or
+# dropped; rows are never DELETEd.
+DETACH_PARTITIONS_FN = """
+CREATE OR REPLACE FUNCTION audit_logs_detach_partitions(retain_months integer, archive boolean DEFAULT true)
+RETURNS SETOF text
+LANGUAGE plpgsql AS $$
+DECLARE
+    cutoff date := (date_trunc('month', now()) - make_interval(months => retain_months))::date;
+    part record;
+BEGIN
+    FOR part IN
+        SELECT c.relname,
+               to_date(substring(c.relname from '^audit_logs_(\\d{4}_\\d{2})$'), 'YYYY_MM') AS month_start
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'audit_logs'::regclass
+    LOOP
+        CONTINUE WHEN part.month_start IS NULL;
+        CONTINUE WHEN (part.month_start + interval '1 month')::date > cutoff;
+
+        EXECUTE format('ALTER TABLE audit_logs DETACH PARTITION %I', part.relname);
+        IF archive THEN
+            EXECUTE format('ALTER TABLE %I SET SCHEMA audit_archive', part.relname);
+        ELSE
+            EXECUTE format('DROP TABLE %I', part.relname);
+        END IF;
+        RETURN NEXT part.relname;
+    END LOOP;
+END
+$$;
+"""
+
+
+def upgrade() -> None:
+    op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_legacy')
+    op.execute('ALTER TABLE audit_logs_legacy RENAME CONSTRAINT audit_logs_pkey TO audit_logs_legacy_pkey')
+    op.drop_index('idx_audit_action_time', table_name='audit_logs_legacy')
+    op.drop_index('ix_audit_logs_action', table_name='audit_logs_legacy')
+    op.drop_index('ix_audit_logs_created_at', table_name='audit_logs_legacy')
+    op.drop_index('ix_audit_logs_user_id', table_name='audit_logs_legacy')
+
+    # Partition key must be part of the primary key
+    op.execute("""
+        CREATE TABLE audit_logs (
+            id uuid NOT NULL DEFAULT gen_random_uuid(),
+            user_id uuid REFERENCES users(id) ON DELETE SET NULL,
+            action varchar(100) NOT NULL,
+            resource_type varchar(50),
+            resource_id uuid,
+            ip_address inet,
+            user_agent text,
+            request_data jsonb,
+            response_status integer,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # Safety net for rows outside any monthly partition; stays empty in normal operation
+    op.execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+
+    # Append-only, time-ordered rows: BRIN is tiny and nearly free to maintain
+    op.execute('CREATE INDEX idx_audit_created_brin ON audit_logs USING brin (created_at) WITH (pages_per_range = 32)')
+    op.create_index('idx_audit_user_id', 'audit_logs', ['user_id'])
+    # Created on the parent, so every partition (existing and future) gets it
+    op.create_index('idx_audit_action_time', 'audit_logs', ['action', 'created_at'])
+
+    op.execute('CREATE SCHEMA IF NOT EXISTS audit_archive')
+    op.execute(CREATE_PARTITIONS_FN)
+    op.execute(DETACH_PARTITIONS_FN)
+
+    # Partitions for existing history plus three months ahead
+    op.execute("""
+        SELECT audit_logs_create_partitions(
+            COALESCE((SELECT min(created_at) FROM audit_logs_legacy)::date, current_date),
+            3
+        )
+    """)
+
+    op.execute("""
+        INSERT INTO audit_logs (id, user_id, action, resource_type, resource_id, ip_address,
+                                user_agent, request_data, response_status, created_at)
+        SELECT id, user_id, action, resource_type, resource_id, ip_address,
+               user_agent, request_data, response_status, COALESCE(created_at, now())
+        FROM audit_logs_legacy
+    """)
+    op.drop_table('audit_logs_legacy')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_partitioned')
+    # Index names are per schema; free this one for the plain table
+    op.drop_index('idx_audit_action_time', table_name='audit_logs_partitioned')
+
+    op.create_table(
+        'audit_logs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True, server_default=sa.text('gen_random_uuid()')),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='SET NULL'), nullable=True, index=True),
+        sa.Column('action', sa.String(100), nullable=False, index=True),
+        sa.Column('resource_type', sa.String(50), nullable=True),
+        sa.Column('resource_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('ip_address', postgresql.INET(), nullable=True),
+        sa.Column('user_agent', sa.Text(), nullable=True),
+        sa.Column('request_data', postgresql.JSONB(), nullable=True),
+        sa.Column('response_status', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), index=True),
+    )
+    op.create_index('idx_audit_action_time', 'audit_logs', ['action', 'created_at'])
+
+    op.execute('INSERT INTO audit_logs SELECT * FROM audit_logs_partitioned')
+    op.execute('DROP TABLE audit_logs_partitioned CASCADE')
+    op.execute('DROP FUNCTION IF EXISTS audit_logs_detach_partitions(integer, boolean)')
+    op.execute('DROP FUNCTION IF EXISTS audit_logs_create_partitions(date, integer)')
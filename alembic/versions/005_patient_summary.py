@@ -0,0 +1,134 @@
+"""Patient summary projection for timeline headers
+
+Revision ID: 005_patient_summary
+Revises: 004_partition_audit_logs
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '005_patient_summary'
+down_revision = '004_partition_audit_logs'
+branch_labels = None
+depends_on = None
+
+
+# Snapshot of the app.services.patient_summary rules at this revision, frozen
+# on purpose: the backfill must build the same rows whenever it is run. Later
+# rule changes are not retrofitted here; they ship their own data migration.
+CHRONIC_ICD10_PREFIXES = (
+    "E10", "E11", "E03", "E78", "I10", "I11", "I25", "I48", "I50", "J44",
+    "J45", "N18", "M05", "M06", "M15", "M17", "F32", "F33", "G40",
+)
+INACTIVE_CLINICAL_STATUSES = ("inactive", "resolved", "remission", "refuted", "entered-in-error")
+
+CHRONIC_ICD10_PATTERN = "^(" + "|".join(CHRONIC_ICD10_PREFIXES) + ")"
+INACTIVE_CLINICAL_STATUSES_SQL = "(" + ", ".join(f"'{status}'" for status in INACTIVE_CLINICAL_STATUSES) + ")"
+
+
+def upgrade() -> None:
+    op.create_table(
+        'patient_summary',
+        sa.Column('patient_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('patients.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('last_visit', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('chronic_conditions', postgresql.JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column('allergies', postgresql.JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column('active_prescriptions', postgresql.JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    # Backfill once from existing data; write paths maintain it from here on
+    op.execute("INSERT INTO patient_summary (patient_id) SELECT id FROM patients")
+
+    op.execute("""
+        UPDATE patient_summary s
+        SET last_visit = e.last_visit
+        FROM (SELECT patient_id, max(start_time) AS last_visit FROM encounters GROUP BY patient_id) e
+        WHERE e.patient_id = s.patient_id
+    """)
+
+    op.execute("""
+        UPDATE patient_summary s
+        SET active_prescriptions = p.entries
+        FROM (
+            SELECT patient_id,
+                   jsonb_object_agg(id::text, jsonb_build_object(
+                       'prescription_number', prescription_number,
+                       'medications', (
+                           SELECT coalesce(jsonb_agg(name), '[]'::jsonb)
+                           FROM (
+                               SELECT m->>'generic_name' AS name
+                               FROM jsonb_array_elements(CASE WHEN jsonb_typeof(medications) = 'array' THEN medications ELSE '[]'::jsonb END) m
+                               UNION ALL
+                               SELECT m->>'name'
+                               FROM jsonb_array_elements(CASE WHEN jsonb_typeof(ayush_medications) = 'array' THEN ayush_medications ELSE '[]'::jsonb END) m
+                           ) names
+                           WHERE name IS NOT NULL
+                       )
+                   )) AS entries
+            FROM prescriptions
+            WHERE status IN ('signed', 'dispensed')
+            GROUP BY patient_id
+        ) p
+        WHERE p.patient_id = s.patient_id
+    """)
+
+    op.execute(f"""
+        UPDATE patient_summary s
+        SET chronic_conditions = c.entries
+        FROM (
+            SELECT patient_id, jsonb_object_agg(code, entry) AS entries
+            FROM (
+                SELECT DISTINCT ON (e.patient_id, d->>'code')
+                       e.patient_id, d->>'code' AS code,
+                       jsonb_build_object('code', d->>'code',
+                                          'display', coalesce(d->>'display', d->>'description'),
+                                          'source', 'encounter') AS entry
+                FROM encounters e,
+                     jsonb_array_elements(
+                         jsonb_build_array(e.soap_note #> '{{assessment,primary_diagnosis}}')
+                         || coalesce(e.soap_note #> '{{assessment,secondary_diagnoses}}', '[]'::jsonb)
+                     ) d
+                WHERE jsonb_typeof(e.soap_note) = 'object'
+                  AND jsonb_typeof(d) = 'object'
+                  AND (upper(d->>'code') ~ '{CHRONIC_ICD10_PATTERN}' OR lower(d->>'chronic') = 'true')
+                UNION ALL
+                SELECT DISTINCT ON (f.patient_id, f.code)
+                       f.patient_id, f.code,
+                       jsonb_build_object('code', f.code,
+                                          'display', coalesce(f.resource #>> '{{code,coding,0,display}}', f.resource #>> '{{code,text}}'),
+                                          'source', coalesce(f.source, 'fhir'))
+                FROM fhir_resources f
+                WHERE f.resource_type = 'Condition'
+                  AND f.patient_id IS NOT NULL AND f.code IS NOT NULL
+                  AND coalesce(f.resource #>> '{{clinicalStatus,coding,0,code}}', 'active') NOT IN {INACTIVE_CLINICAL_STATUSES_SQL}
+            ) conditions
+            GROUP BY patient_id
+        ) c
+        WHERE c.patient_id = s.patient_id
+    """)
+
+    op.execute(f"""
+        UPDATE patient_summary s
+        SET allergies = a.entries
+        FROM (
+            SELECT patient_id,
+                   jsonb_object_agg(code, jsonb_build_object(
+                       'code', code,
+                       'display', coalesce(resource #>> '{{code,coding,0,display}}', resource #>> '{{code,text}}'),
+                       'criticality', resource->>'criticality'
+                   )) AS entries
+            FROM fhir_resources
+            WHERE resource_type = 'AllergyIntolerance'
+              AND patient_id IS NOT NULL AND code IS NOT NULL
+              AND coalesce(resource #>> '{{clinicalStatus,coding,0,code}}', 'active') NOT IN {INACTIVE_CLINICAL_STATUSES_SQL}
+            GROUP BY patient_id
+        ) a
+        WHERE a.patient_id = s.patient_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('patient_summary')
@@ -0,0 +1,69 @@
+"""Deduplicate wearable samples and track ingest batches
+
+Revision ID: 006_wearable_dedup
+Revises: 005_patient_summary
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '006_wearable_dedup'
+down_revision = '005_patient_summary'
+branch_labels = None
+depends_on = None
+
+
+def has_timescaledb() -> bool:
+    return op.get_bind().execute(
+        sa.text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb')")
+    ).scalar()
+
+
+def upgrade() -> None:
+    # Drop existing duplicates, keeping one row per sample key. A sample's
+    # duplicates share its time and so live in the same chunk / partition.
+    op.execute("""
+        DELETE FROM wearable_data a
+        USING wearable_data b
+        WHERE a.patient_id = b.patient_id
+          AND a.device_type = b.device_type
+          AND a.metric_type = b.metric_type
+          AND a.time = b.time
+          AND a.tableoid = b.tableoid
+          AND a.ctid > b.ctid
+    """)
+
+    # Unique indexes on a hypertable or partitioned table must include the
+    # partitioning column
+    op.create_index(
+        'uq_wearable_sample', 'wearable_data',
+        ['patient_id', 'device_type', 'metric_type', 'time'],
+        unique=True
+    )
+
+    op.create_table(
+        'wearable_ingest_batches',
+        sa.Column('idempotency_key', sa.String(255), primary_key=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='SET NULL'), nullable=True),
+        sa.Column('status', sa.String(20), nullable=False),  # 'in_progress', 'completed'
+        sa.Column('report', postgresql.JSONB(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('idx_wearable_ingest_batches_created', 'wearable_ingest_batches', ['created_at'])
+
+    # Re-materialize the daily aggregate without the removed duplicates;
+    # refresh_continuous_aggregate cannot run inside a transaction
+    if not has_timescaledb():
+        op.execute("SELECT wearable_daily_refresh(NULL, NULL)")
+        return
+    with op.get_context().autocommit_block():
+        op.execute("CALL refresh_continuous_aggregate('wearable_daily_avg', NULL, NULL)")
+
+
+def downgrade() -> None:
+    op.drop_index('idx_wearable_ingest_batches_created', table_name='wearable_ingest_batches')
+    op.drop_table('wearable_ingest_batches')
+    op.drop_index('uq_wearable_sample', table_name='wearable_data')
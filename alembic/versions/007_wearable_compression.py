@@ -0,0 +1,134 @@
+"""Compression and retention policies for wearable_data
+
+On plain PostgreSQL there is no compression; retention is enforced by
+dropping expired monthly partitions (see 003_wearable_data).
+
+Revision ID: 007_wearable_compression
+Revises: 006_wearable_dedup
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '007_wearable_compression'
+down_revision = '006_wearable_dedup'
+branch_labels = None
+depends_on = None
+
+
+def has_timescaledb() -> bool:
+    return op.get_bind().execute(
+        sa.text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb')")
+    ).scalar()
+
+
+# (Re)installs the compression policy on raw samples and the retention
+# policies on raw samples and the daily aggregate. Called with the defaults
+# below here, and with the configured intervals by app.jobs.wearable_policies.
+APPLY_POLICIES_FN = """
+CREATE OR REPLACE FUNCTION wearable_apply_policies(
+    compress_after interval,
+    raw_retention interval,
+    aggregate_retention interval
+)
+RETURNS void
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- The aggregate refresh policy looks back 3 days; dropping raw chunks
+    -- inside that window would erase already materialized days
+    IF raw_retention <= interval '3 days' OR aggregate_retention < raw_retention THEN
+        RAISE EXCEPTION 'invalid wearable retention: raw %, aggregate %', raw_retention, aggregate_retention;
+    END IF;
+
+    PERFORM remove_compression_policy('wearable_data', if_exists => true);
+    PERFORM add_compression_policy('wearable_data', compress_after);
+
+    PERFORM remove_retention_policy('wearable_data', if_exists => true);
+    PERFORM add_retention_policy('wearable_data', raw_retention);
+
+    PERFORM remove_retention_policy('wearable_daily_avg', if_exists => true);
+    PERFORM add_retention_policy('wearable_daily_avg', aggregate_retention);
+END
+$$;
+"""
+
+
+# Plain PostgreSQL: drops monthly partitions that ended before the raw
+# retention cutoff and rollup days older than the aggregate retention, like
+# the TimescaleDB retention policies do. Returns the dropped partitions.
+ENFORCE_RETENTION_FN = """
+CREATE OR REPLACE FUNCTION wearable_enforce_retention(raw_retention interval, aggregate_retention interval)
+RETURNS SETOF text
+LANGUAGE plpgsql AS $$
+DECLARE
+    part record;
+BEGIN
+    IF raw_retention <= interval '3 days' OR aggregate_retention < raw_retention THEN
+        RAISE EXCEPTION 'invalid wearable retention: raw %, aggregate %', raw_retention, aggregate_retention;
+    END IF;
+
+    FOR part IN
+        SELECT c.relname,
+               to_date(substring(c.relname from '^wearable_data_(\\d{4}_\\d{2})$'), 'YYYY_MM') AS month_start
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'wearable_data'::regclass
+    LOOP
+        CONTINUE WHEN part.month_start IS NULL;
+        CONTINUE WHEN (part.month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC' > now() - raw_retention;
+
+        EXECUTE format('DROP TABLE %I', part.relname);
+        RETURN NEXT part.relname;
+    END LOOP;
+
+    DELETE FROM wearable_daily_avg WHERE day < now() - aggregate_retention;
+END
+$$;
+"""
+
+
+def upgrade() -> None:
+    if not has_timescaledb():
+        op.execute(ENFORCE_RETENTION_FN)
+        return
+
+    # One compressed segment per patient and metric, rows ordered by time, so
+    # per-patient series reads decompress only the segments they need. The
+    # sample key columns are all segmentby/orderby columns, which keeps
+    # ON CONFLICT DO NOTHING on uq_wearable_sample working on compressed chunks.
+    op.execute("""
+        ALTER TABLE wearable_data SET (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = 'patient_id, metric_type',
+            timescaledb.compress_orderby = 'time DESC, device_type'
+        )
+    """)
+
+    op.execute(APPLY_POLICIES_FN)
+    # Keep in step with the WEARABLE_*_DAYS defaults in app.core.config
+    op.execute("SELECT wearable_apply_policies(interval '7 days', interval '180 days', interval '1825 days')")
+
+
+def downgrade() -> None:
+    if not has_timescaledb():
+        op.execute("DROP FUNCTION IF EXISTS wearable_enforce_retention(interval, interval)")
+        return
+
+    op.execute("SELECT remove_retention_policy('wearable_daily_avg', if_exists => true)")
+    op.execute("SELECT remove_retention_policy('wearable_data', if_exists => true)")
+    op.execute("SELECT remove_compression_policy('wearable_data', if_exists => true)")
+    op.execute("DROP FUNCTION IF EXISTS wearable_apply_policies(interval, interval, interval)")
+
+    op.execute("""
+        DO $$
+        DECLARE
+            chunk regclass;
+        BEGIN
+            FOR chunk IN SELECT show_chunks('wearable_data') LOOP
+                PERFORM decompress_chunk(chunk, if_compressed => true);
+            END LOOP;
+        END
+        $$;
+    """)
+    op.execute("ALTER TABLE wearable_data SET (timescaledb.compress = false)")
@@ -0,0 +1,31 @@
+"""Watermarks for incremental jobs
+
+Revision ID: 008_job_watermarks
+Revises: 007_wearable_compression
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '008_job_watermarks'
+down_revision = '007_wearable_compression'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'job_watermarks',
+        sa.Column('job_name', sa.String(100), primary_key=True),
+        sa.Column('watermark', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    # Anomaly Observations are upserted by resource_id
+    op.create_index('idx_fhir_resources_resource_id', 'fhir_resources', ['resource_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_fhir_resources_resource_id', table_name='fhir_resources')
+    op.drop_table('job_watermarks')
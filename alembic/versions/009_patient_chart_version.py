@@ -0,0 +1,26 @@
+"""Shared chart version per patient
+
+Revision ID: 009_patient_chart_version
+Revises: 008_job_watermarks
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '009_patient_chart_version'
+down_revision = '008_job_watermarks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Constant default: no table rewrite on PostgreSQL 11+
+    op.add_column(
+        'patients',
+        sa.Column('chart_version', sa.BigInteger(), nullable=False, server_default=sa.text('0'))
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('patients', 'chart_version')
@@ -3,16 +3,23 @@ Authentication API Endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select, event
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 import httpx
 import jwt
 from uuid import UUID
 
-from app.core.database import get_db
+from app.core.database import get_async_db, load_primary_pin
+from app.core.audit import AuditEvent, audit_sink
+from app.core.cache import TTLCache, invalidation_bus
 from app.core.config import settings
-from app.models.database import User, AuditLog
+from app.core.http import UpstreamClient, get_hpr_client
+from app.core.request_context import get_request_context
+from app.models.database import User
 from app.schemas.api import HPRAuthInit, HPRAuthVerify, TokenResponse, UserResponse
 
 router = APIRouter()
@@ -23,35 +30,32 @@ router = APIRouter()
 @router.post("/doctor/init", response_model=dict)
 async def init_doctor_auth(
     auth_data: HPRAuthInit,
-    db: Session = Depends(get_db)
+    hpr: UpstreamClient = Depends(get_hpr_client)
 ):
     """
     Initialize doctor authentication via HPR
     Sends OTP to registered mobile number
     """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{settings.HPR_API_URL}/v1/auth/init",
-                json={
-                    "authMethod": "MOBILE_OTP",
-                    "healthId": auth_data.mobile
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=10.0
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Failed to send OTP. Please verify mobile number."
-                )
-            
-            data = response.json()
-            return {
-                "txn_id": data.get("txnId"),
-                "message": "OTP sent to registered mobile number"
+        response = await hpr.post(
+            f"{settings.HPR_API_URL}/v1/auth/init",
+            json={
+                "authMethod": "MOBILE_OTP",
+                "healthId": auth_data.mobile
             }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Failed to send OTP. Please verify mobile number."
+            )
+        
+        data = response.json()
+        return {
+            "txn_id": data.get("txnId"),
+            "message": "OTP sent to registered mobile number"
+        }
     
     except httpx.RequestError as e:
         raise HTTPException(
@@ -63,7 +67,8 @@ async def init_doctor_auth(
 @router.post("/doctor/verify", response_model=TokenResponse)
 async def verify_doctor_auth(
     auth_data: HPRAuthVerify,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    hpr: UpstreamClient = Depends(get_hpr_client)
 ):
     """
     Verify OTP and complete authentication
@@ -71,43 +76,36 @@ async def verify_doctor_auth(
     """
     try:
         # Verify OTP with HPR
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{settings.HPR_API_URL}/v1/auth/confirmWithMobileOTP",
-                json={
-                    "txnId": auth_data.txn_id,
-                    "otp": auth_data.otp
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=10.0
+        response = await hpr.post(
+            f"{settings.HPR_API_URL}/v1/auth/confirmWithMobileOTP",
+            json={
+                "txnId": auth_data.txn_id,
+                "otp": auth_data.otp
+            }
+        )
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid OTP"
             )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid OTP"
-                )
-            
-            hpr_data = response.json()
         
-        # Fetch doctor profile from HPR
+        hpr_data = response.json()
+        
+        # Fetch doctor profile from HPR (reuses the pooled connection)
         hpr_id = hpr_data.get("hprId")
         
-        async with httpx.AsyncClient() as client:
-            profile_response = await client.get(
-                f"{settings.HPR_API_URL}/v1/search/searchByHealthId",
-                params={"healthId": hpr_id},
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {hpr_data.get('token')}"
-                },
-                timeout=10.0
-            )
-            
-            profile = profile_response.json()
+        profile_response = await hpr.get(
+            f"{settings.HPR_API_URL}/v1/search/searchByHealthId",
+            params={"healthId": hpr_id},
+            headers={"Authorization": f"Bearer {hpr_data.get('token')}"}
+        )
+        
+        profile = profile_response.json()
         
         # Find or create user in database
-        user = db.query(User).filter(User.hpr_id == hpr_id).first()
+        result = await db.execute(select(User).where(User.hpr_id == hpr_id))
+        user = result.scalar_one_or_none()
         
         if not user:
             # Create new user from HPR profile
@@ -125,23 +123,21 @@ async def verify_doctor_auth(
                 is_active=True
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
         
         # Generate JWT tokens
         access_token = _create_access_token(user.id)
         refresh_token = _create_refresh_token(user.id)
         
-        # Log authentication
-        audit = AuditLog(
+        # Log authentication (batched off the request path)
+        await audit_sink.record(AuditEvent(
             user_id=user.id,
             action="login",
             resource_type="user",
             resource_id=user.id,
             response_status=200
-        )
-        db.add(audit)
-        db.commit()
+        ))
         
         return TokenResponse(
             access_token=access_token,
@@ -198,32 +194,99 @@ def _create_refresh_token(user_id: UUID) -> str:
     return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
-def get_current_user(
+# =============== Principal Resolution ===============
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Immutable snapshot of the authenticated user, safe to share across requests
+    """
+    id: UUID
+    system: str
+    role: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, system=user.system, role=user.role, is_active=bool(user.is_active))
+
+
+_principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+invalidation_bus.subscribe("principal", _principal_cache.pop)
+
+
+def invalidate_principal(user_id) -> None:
+    """
+    Drop a cached principal in this and every other worker
+    """
+    invalidation_bus.publish("principal", str(user_id))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = {str(obj.id) for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault("changed_user_ids", set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        invalidate_principal(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("changed_user_ids", None)
+
+
+async def get_current_user(
     token: str = Depends(OAuth2PasswordBearer(tokenUrl="token")),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
     """
     Dependency to get current authenticated user
     """
+    return await principal_from_token(token, db)
+
+
+async def principal_from_token(token: str, db: AsyncSession) -> Principal:
+    """
+    Resolve an access token to its principal; raises HTTPException.
+    Served from the principal cache; the database is only hit on a miss
+    """
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        user = db.query(User).filter(User.id == UUID(user_id)).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
+        # Lets the data layer apply read-your-writes routing for this user
+        get_request_context().user_id = user_id
+        await load_primary_pin(user_id)
         
-        if not user.is_active:
+        principal = _principal_cache.get(user_id)
+        if principal is None:
+            result = await db.execute(select(User).where(User.id == UUID(user_id)))
+            user = result.scalar_one_or_none()
+            if not user:
+                raise HTTPException(status_code=401, detail="User not found")
+            
+            principal = Principal.from_user(user)
+            _principal_cache.set(user_id, principal)
+        
+        if not principal.is_active:
             raise HTTPException(status_code=403, detail="Inactive user")
         
-        return user
+        return principal
     
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-
 from fastapi.security import OAuth2PasswordBearer
@@ -0,0 +1,86 @@
+"""
+Live WebSocket Endpoints
+"""
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect, status
+from typing import Optional
+from uuid import UUID
+import asyncio
+import logging
+
+from app.api.auth import principal_from_token
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.live_vitals import vitals_broker
+from app.core.metrics import LIVE_VITALS_CONNECTIONS
+from app.models.database import Patient
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+async def _authorize(websocket: WebSocket, patient_id: UUID, token: Optional[str]) -> bool:
+    """
+    Check the token and the patient with a short-lived session, so no
+    connection is held for the lifetime of the socket
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        return False
+    async with AsyncSessionLocal() as db:
+        try:
+            await principal_from_token(token, db)
+        except HTTPException:
+            return False
+        return await db.get(Patient, patient_id) is not None
+
+
+async def _wait_for_close(websocket: WebSocket):
+    # Clients only listen; reading is how a disconnect is noticed
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+async def _send_updates(websocket: WebSocket, patient_id: UUID, subscription):
+    while True:
+        samples = await subscription.next_delta()
+        await websocket.send_json({"type": "vitals", "patient_id": str(patient_id), "samples": samples})
+        # Whatever arrives meanwhile is coalesced into the next message
+        await asyncio.sleep(settings.LIVE_VITALS_MIN_INTERVAL_SECONDS)
+
+
+@router.websocket("/vitals/{patient_id}")
+async def live_vitals(websocket: WebSocket, patient_id: UUID, token: Optional[str] = None):
+    """
+    Push newly ingested vitals for a patient
+
+    Authenticate with an `Authorization: Bearer` header or, from browsers,
+    the `token` query parameter. Each message carries the latest sample of
+    every (device, metric) updated since the previous one.
+    """
+    if not await _authorize(websocket, patient_id, token):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = vitals_broker.subscribe(patient_id)
+    LIVE_VITALS_CONNECTIONS.inc()
+    tasks = [
+        asyncio.create_task(_wait_for_close(websocket)),
+        asyncio.create_task(_send_updates(websocket, patient_id, subscription)),
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled() and task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                logger.warning(f"Live vitals connection for {patient_id} failed: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        vitals_broker.unsubscribe(patient_id, subscription)
+        LIVE_VITALS_CONNECTIONS.dec()
@@ -1,13 +1,17 @@
 """
 Patient Management and Clinical API Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from uuid import UUID
 from datetime import datetime, timedelta
+import json
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_async_db, get_async_read_db
 from app.models.database import Patient, Encounter, FHIRResource
 from app.schemas.api import (
     PatientCreate,
@@ -16,10 +20,34 @@ from app.schemas.api import (
     EncounterUpdate,
     EncounterResponse,
     HealthTimelineResponse,
-    TimelineEvent
+    TimelineEvent,
+    FHIRResourceCreate,
+    FHIRResourceResponse
+)
+from app.api.auth import get_current_user, Principal
+from app.services import chart_cache
+from app.services.patient_summary import record_encounter, record_fhir_resource, refresh_encounter_facts
+from app.services.fieldsets import ModelFieldset
+from app.services.timeline import (
+    TimelineFilter,
+    decode_cursor,
+    fetch_event,
+    fetch_timeline,
+    parse_timeline_fieldset,
+    stream_timeline
+)
+from app.services.wearables import fetch_downsampled_series, fetch_wearable_series
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+PATIENT_FIELDS = ModelFieldset(
+    Patient,
+    default=frozenset({
+        "id", "abha_number", "abha_address", "name", "mobile", "email", "gender",
+        "date_of_birth", "year_of_birth", "is_active", "created_at"
+    }),
+    heavy=frozenset({"address", "emergency_contact"})
 )
-from app.api.auth import get_current_user
-from app.models.database import User
 
 # Patient Router
 patients_router = APIRouter()
@@ -28,17 +56,18 @@ patients_router = APIRouter()
 @patients_router.post("/", response_model=PatientResponse)
 async def create_patient(
     patient_data: PatientCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Register a new patient
     """
     # Check if ABHA already exists
     if patient_data.abha_number:
-        existing = db.query(Patient).filter(
-            Patient.abha_number == patient_data.abha_number
-        ).first()
+        result = await db.execute(
+            select(Patient).where(Patient.abha_number == patient_data.abha_number)
+        )
+        existing = result.scalar_one_or_none()
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -47,8 +76,8 @@ async def create_patient(
     
     patient = Patient(**patient_data.dict())
     db.add(patient)
-    db.commit()
-    db.refresh(patient)
+    await db.commit()
+    await db.refresh(patient)
     
     return PatientResponse.from_orm(patient)
 
@@ -56,13 +85,34 @@ async def create_patient(
 @patients_router.get("/{patient_id}", response_model=PatientResponse)
 async def get_patient(
     patient_id: UUID,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get patient details
+    `expand=address,emergency_contact` adds the JSONB contact blocks
     """
-    patient = db.query(Patient).filter(Patient.id == patient_id).first()
+    try:
+        fieldset = PATIENT_FIELDS.parse(fields, expand)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    etag, cached = await chart_cache.lookup(request, db, patient_id)
+    if cached is not None:
+        return cached
+    
+    result = await db.execute(
+        select(Patient)
+        .options(PATIENT_FIELDS.load_options(fieldset))
+        .where(Patient.id == patient_id)
+    )
+    patient = result.scalar_one_or_none()
     
     if not patient:
         raise HTTPException(
@@ -70,7 +120,7 @@ async def get_patient(
             detail="Patient not found"
         )
     
-    return PatientResponse.from_orm(patient)
+    return chart_cache.store(etag, json.dumps(PATIENT_FIELDS.payload(patient, fieldset)).encode())
 
 
 # Encounter Router
@@ -80,8 +130,8 @@ encounters_router = APIRouter()
 @encounters_router.post("/", response_model=EncounterResponse)
 async def create_encounter(
     encounter_data: EncounterCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new clinical encounter
@@ -92,8 +142,10 @@ async def create_encounter(
         status="in_progress"
     )
     db.add(encounter)
-    db.commit()
-    db.refresh(encounter)
+    await db.flush()
+    await record_encounter(db, encounter)
+    await db.commit()
+    await db.refresh(encounter)
     
     return EncounterResponse.from_orm(encounter)
 
@@ -102,16 +154,19 @@ async def create_encounter(
 async def update_encounter(
     encounter_id: UUID,
     encounter_update: EncounterUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update encounter (add SOAP note, change status)
     """
-    encounter = db.query(Encounter).filter(
-        Encounter.id == encounter_id,
-        Encounter.doctor_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Encounter).where(
+            Encounter.id == encounter_id,
+            Encounter.doctor_id == current_user.id
+        )
+    )
+    encounter = result.scalar_one_or_none()
     
     if not encounter:
         raise HTTPException(
@@ -127,8 +182,10 @@ async def update_encounter(
             value = value.dict() if value else None
         setattr(encounter, field, value)
     
-    db.commit()
-    db.refresh(encounter)
+    # Diagnoses may have been corrected away, so recompute rather than merge
+    await refresh_encounter_facts(db, encounter.patient_id)
+    await db.commit()
+    await db.refresh(encounter)
     
     return EncounterResponse.from_orm(encounter)
 
@@ -140,15 +197,32 @@ clinical_router = APIRouter()
 @clinical_router.get("/health-graph/{patient_id}", response_model=HealthTimelineResponse)
 async def get_health_timeline(
     patient_id: UUID,
+    request: Request,
     start_date: datetime = None,
     end_date: datetime = None,
     include_wearables: bool = True,
     include_ayush: bool = True,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=settings.TIMELINE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    accept: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get integrated health timeline (Allopathy + AYUSH + Wearables)
+
+    Pages are keyed on (date, type, id): pass `next_cursor` back as `cursor`
+    for the next page. With `Accept: application/x-ndjson` events are streamed
+    one per line from a server-side cursor (all of them unless `limit` is set).
+    Wearable series are returned with the first JSON page, at a resolution
+    picked from the date range. JSON pages carry an ETag that stays valid
+    until the next write touching the patient.
+
+    Events leave out SOAP notes, AYUSH assessments and raw FHIR resources
+    unless named in `expand` (soap_note, ayush_assessment, resource);
+    `fields` narrows each event to the listed keys.
     """
     # Set default date range if not provided
     if not end_date:
@@ -156,76 +230,122 @@ async def get_health_timeline(
     if not start_date:
         start_date = end_date - timedelta(days=365)
     
-    timeline_events = []
-    
-    # Get encounters
-    encounters = db.query(Encounter).filter(
-        Encounter.patient_id == patient_id,
-        Encounter.start_time >= start_date,
-        Encounter.start_time <= end_date
-    ).order_by(Encounter.start_time.desc()).all()
-    
-    for encounter in encounters:
-        event_type = "ayush" if encounter.ayush_assessment else "allopathic"
-        
-        event = TimelineEvent(
-            date=encounter.start_time,
-            type=event_type,
-            category="consultation",
-            facility=f"Dr. {encounter.doctor.name}",
-            data={
-                "encounter_id": str(encounter.id),
-                "type": encounter.encounter_type,
-                "chief_complaint": encounter.chief_complaint,
-                "soap_note": encounter.soap_note,
-                "ayush_assessment": encounter.ayush_assessment
-            }
+    try:
+        if cursor is not None:
+            decode_cursor(cursor)
+        fieldset = parse_timeline_fieldset(fields, expand)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
-        timeline_events.append(event)
-    
-    # Get FHIR resources (labs, observations)
-    fhir_resources = db.query(FHIRResource).filter(
-        FHIRResource.patient_id == patient_id,
-        FHIRResource.effective_date >= start_date.date(),
-        FHIRResource.effective_date <= end_date.date()
-    ).all()
-    
-    for resource in fhir_resources:
-        event = TimelineEvent(
-            date=datetime.combine(resource.effective_date, datetime.min.time()),
-            type="allopathic",
-            category=resource.category or "observation",
-            facility=resource.source_system,
-            data={
-                "resource_type": resource.resource_type,
-                "code": resource.code,
-                "value_numeric": float(resource.value_numeric) if resource.value_numeric else None,
-                "value_text": resource.value_text,
-                "resource": resource.resource
-            }
+    
+    timeline_filter = TimelineFilter(patient_id, start_date, end_date, include_ayush, fieldset)
+    
+    if accept and NDJSON_MEDIA_TYPE in accept:
+        return StreamingResponse(
+            stream_timeline(timeline_filter, limit, cursor),
+            media_type=NDJSON_MEDIA_TYPE
         )
-        timeline_events.append(event)
-    
-    # TODO: Add wearable data if include_wearables is True
-    # Query wearable_data table and aggregate
-    
-    # Sort timeline by date
-    timeline_events.sort(key=lambda x: x.date, reverse=True)
-    
-    # Generate summary
-    summary = {
-        "total_events": len(timeline_events),
-        "last_visit": encounters[0].start_time if encounters else None,
-        "chronic_conditions": [],  # Extract from assessment
-        "current_medications": 0,  # Count active prescriptions
-        "allergy_alerts": []
-    }
-    
-    return HealthTimelineResponse(
-        patient_id=patient_id,
-        timeline=timeline_events,
-        summary=summary
+    
+    etag, cached = await chart_cache.lookup(request, db, patient_id)
+    if cached is not None:
+        return cached
+    
+    # Encounters, FHIR resources and prescriptions in one ordered query;
+    # the payload is already JSON-ready, so skip per-event model validation
+    payload = await fetch_timeline(db, timeline_filter, limit or settings.TIMELINE_DEFAULT_LIMIT, cursor)
+    
+    # Wearable series ride along with the first page, bucketed to the window
+    if include_wearables and cursor is None:
+        payload["wearables"] = await fetch_wearable_series(db, patient_id, start_date, end_date)
+    
+    return chart_cache.store(etag, json.dumps(payload).encode())
+
+
+@clinical_router.get("/health-graph/{patient_id}/events/{event_id}", response_model=TimelineEvent)
+async def get_timeline_event(
+    patient_id: UUID,
+    event_id: UUID,
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Full payload of one timeline event (SOAP note, AYUSH assessment, FHIR resource)
+    """
+    etag, cached = await chart_cache.lookup(request, db, patient_id)
+    if cached is not None:
+        return cached
+    
+    event = await fetch_event(db, patient_id, event_id)
+    
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Timeline event not found"
+        )
+    
+    return chart_cache.store(etag, json.dumps(event).encode())
+
+
+@clinical_router.get("/wearables/{patient_id}/series", response_model=dict)
+async def get_wearable_series(
+    patient_id: UUID,
+    request: Request,
+    metrics: str = "heart_rate,hrv,steps",
+    start_date: datetime = None,
+    end_date: datetime = None,
+    points: int = Query(settings.WEARABLE_SERIES_DEFAULT_POINTS, ge=10, le=settings.WEARABLE_SERIES_MAX_POINTS),
+    algorithm: str = Query("lttb", pattern="^(lttb|minmax)$"),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Wearable chart series downsampled server-side to at most `points` points
+    per metric (LTTB, or min/max per bucket to keep every spike)
+    """
+    if not end_date:
+        end_date = datetime.utcnow()
+    if not start_date:
+        start_date = end_date - timedelta(days=90)
+    
+    etag, cached = await chart_cache.lookup(request, db, patient_id)
+    if cached is not None:
+        return cached
+    
+    metric_list = [metric.strip() for metric in metrics.split(",") if metric.strip()]
+    payload = await fetch_downsampled_series(
+        db, patient_id, metric_list, start_date, end_date, points, algorithm
     )
+    
+    return chart_cache.store(etag, json.dumps(payload).encode())
+
+
+@clinical_router.post("/fhir-resources", response_model=FHIRResourceResponse)
+async def ingest_fhir_resource(
+    resource_data: FHIRResourceCreate,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Store a FHIR resource (Observation, Condition, AllergyIntolerance, ...)
+    Conditions and allergies are folded into the patient summary
+    """
+    if not resource_data.patient_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="patient_id is required"
+        )
+    
+    resource = FHIRResource(**resource_data.dict())
+    db.add(resource)
+    await db.flush()
+    await record_fhir_resource(db, resource)
+    await db.commit()
+    await db.refresh(resource)
+    
+    return FHIRResourceResponse.from_orm(resource)
 
 
 # Export routers
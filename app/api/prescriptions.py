@@ -2,8 +2,10 @@
 Prescription API Endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from uuid import UUID
 import re
 import hashlib
@@ -12,8 +14,8 @@ import io
 import base64
 from datetime import datetime
 
-from app.core.database import get_db
-from app.models.database import Prescription, User, Patient, Encounter
+from app.core.database import get_async_db, get_async_read_db
+from app.models.database import Prescription, Patient, Encounter
 from app.schemas.api import (
     PrescriptionCreate,
     PrescriptionResponse,
@@ -23,27 +25,46 @@ from app.schemas.api import (
     InteractionCheckResponse,
     Interaction
 )
-from app.api.auth import get_current_user
+from app.api.auth import get_current_user, Principal
+from app.services.fieldsets import ModelFieldset
+from app.services.patient_summary import record_prescription
+from app.services.drug_knowledge import DrugKnowledgeBase, Frequency, get_knowledge_base, reload as reload_knowledge_base, request_reload
+from app.services import interaction_cache
 
 router = APIRouter()
 
+PRESCRIPTION_FIELDS = ModelFieldset(
+    Prescription,
+    default=frozenset({
+        "id", "prescription_number", "encounter_id", "patient_id", "doctor_id", "status",
+        "medications", "ayush_medications", "instructions", "signature_hash",
+        "signature_timestamp", "qr_code_data", "abdm_pushed", "nmc_compliant",
+        "generic_first", "created_at"
+    }),
+    heavy=frozenset({"qr_code_image", "signature_certificate"})
+)
+
+# "drug strength frequency duration", e.g. "metf 1000 bd 30d"
+SHORTHAND_PATTERN = re.compile(r"(\w+)\s+(\d+)\s+(\w+)\s+(\d+)d")
+
 
 # =============== Prescription Management ===============
 
 @router.post("/draft", response_model=PrescriptionResponse)
 async def create_prescription_draft(
     prescription_data: PrescriptionCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a prescription draft
     Validates NMC compliance and drug interactions
     """
     # Verify encounter exists and belongs to patient
-    encounter = db.query(Encounter).filter(
-        Encounter.id == prescription_data.encounter_id
-    ).first()
+    result = await db.execute(
+        select(Encounter).where(Encounter.id == prescription_data.encounter_id)
+    )
+    encounter = result.scalar_one_or_none()
     
     if not encounter:
         raise HTTPException(
@@ -78,22 +99,58 @@ async def create_prescription_draft(
     )
     
     db.add(prescription)
-    db.commit()
-    db.refresh(prescription)
+    await db.commit()
+    await db.refresh(prescription)
     
     return PrescriptionResponse.from_orm(prescription)
 
 
+@router.get("/{prescription_id}", response_model=PrescriptionResponse)
+async def get_prescription(
+    prescription_id: UUID,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Get a prescription
+    `expand=qr_code_image,signature_certificate` adds the large signature blobs
+    """
+    try:
+        fieldset = PRESCRIPTION_FIELDS.parse(fields, expand)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    result = await db.execute(
+        select(Prescription)
+        .options(PRESCRIPTION_FIELDS.load_options(fieldset))
+        .where(Prescription.id == prescription_id)
+    )
+    prescription = result.scalar_one_or_none()
+    
+    if not prescription:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Prescription not found"
+        )
+    
+    return JSONResponse(content=PRESCRIPTION_FIELDS.payload(prescription, fieldset))
+
+
 @router.post("/expand-shorthand", response_model=MedicationExpanded)
 async def expand_medication_shorthand(
     shorthand: ShorthandExpansion,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Expand medication shorthand to full prescription format
     Example: "Metf 1000 bd 30d" -> Full medication object
     """
-    expanded = _parse_medication_shorthand(shorthand.shorthand)
+    expanded = _parse_medication_shorthand(shorthand.shorthand, get_knowledge_base())
     
     if not expanded:
         raise HTTPException(
@@ -104,51 +161,92 @@ async def expand_medication_shorthand(
     return expanded
 
 
+@router.post("/knowledge-base/reload")
+async def reload_drug_knowledge_base(
+    current_user: Principal = Depends(get_current_user)
+):
+    """
+    Reload the drug master file in every worker (admin only)
+    """
+    if current_user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can reload drug master data"
+        )
+    
+    # Load here first so a bad file is reported to the caller
+    try:
+        knowledge_base = reload_knowledge_base()
+    except (OSError, ValueError, KeyError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Drug master file rejected: {e}"
+        )
+    request_reload()
+    
+    return {"version": knowledge_base.version, "drugs": len(knowledge_base.drugs)}
+
+
 @router.post("/check-interactions", response_model=InteractionCheckResponse)
 async def check_drug_interactions(
     request: InteractionCheckRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Check for drug-drug and herb-drug interactions
     Returns interaction warnings and contraindications
     """
+    kb = get_knowledge_base()
     interactions = []
     contraindications = []
     allergy_alerts = []
     
+    generic_names = [med.generic_name for med in request.medications]
+    herbs = [ayush_med.name for ayush_med in request.ayush_medications or []]
+    conditions = request.patient_conditions or []
+    findings = await interaction_cache.get_findings(
+        kb, generic_names, herbs, conditions, request.patient_allergies or []
+    )
+    
     # Check allopathic drug-drug interactions
-    for i, med1 in enumerate(request.medications):
-        for med2 in request.medications[i+1:]:
-            interaction = _check_drug_drug_interaction(med1, med2)
-            if interaction:
-                interactions.append(interaction)
+    for i, j, rule in findings.drug_interactions(generic_names):
+        interactions.append(Interaction(
+            type="drug_drug",
+            severity=rule.severity,
+            drug1=generic_names[i],
+            drug2=generic_names[j],
+            description=rule.description,
+            recommendation=rule.recommendation
+        ))
     
     # Check herb-drug interactions
-    if request.ayush_medications:
-        for ayush_med in request.ayush_medications:
-            for allopathic_med in request.medications:
-                interaction = _check_herb_drug_interaction(ayush_med, allopathic_med)
-                if interaction:
-                    interactions.append(interaction)
+    for h, m, rule in findings.herb_drug_interactions(herbs, generic_names):
+        interactions.append(Interaction(
+            type="herb_drug",
+            severity=rule.severity,
+            drug1=herbs[h],
+            drug2=generic_names[m],
+            description=rule.description,
+            recommendation=rule.recommendation,
+            references=list(rule.references)
+        ))
     
     # Check contraindications
-    if request.patient_conditions:
-        for med in request.medications:
-            for condition in request.patient_conditions:
-                contraindication = _check_contraindication(med, condition)
-                if contraindication:
-                    contraindications.append(contraindication)
+    for m, condition, message in findings.contraindications(generic_names, conditions):
+        contraindications.append({
+            "medication": generic_names[m],
+            "condition": condition,
+            "severity": "critical",
+            "message": message
+        })
     
     # Check allergies
-    if request.patient_allergies:
-        for med in request.medications:
-            if _is_allergic(med, request.patient_allergies):
-                allergy_alerts.append({
-                    "medication": med.generic_name,
-                    "severity": "critical",
-                    "message": "Patient has known allergy to this medication"
-                })
+    for m in findings.allergic_positions(generic_names):
+        allergy_alerts.append({
+            "medication": generic_names[m],
+            "severity": "critical",
+            "message": "Patient has known allergy to this medication"
+        })
     
     # Calculate safety score (0-10)
     safety_score = _calculate_safety_score(interactions, contraindications, allergy_alerts)
@@ -164,17 +262,20 @@ async def check_drug_interactions(
 @router.post("/{prescription_id}/sign", response_model=PrescriptionResponse)
 async def sign_prescription(
     prescription_id: UUID,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Digitally sign prescription
     Generates signature hash and QR code
     """
-    prescription = db.query(Prescription).filter(
-        Prescription.id == prescription_id,
-        Prescription.doctor_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Prescription).where(
+            Prescription.id == prescription_id,
+            Prescription.doctor_id == current_user.id
+        )
+    )
+    prescription = result.scalar_one_or_none()
     
     if not prescription:
         raise HTTPException(
@@ -203,15 +304,54 @@ async def sign_prescription(
     prescription.qr_code_data = qr_data
     prescription.qr_code_image = qr_image
     
-    db.commit()
-    db.refresh(prescription)
+    await record_prescription(db, prescription)
+    await db.commit()
+    await db.refresh(prescription)
+    
+    return PrescriptionResponse.from_orm(prescription)
+
+
+@router.post("/{prescription_id}/cancel", response_model=PrescriptionResponse)
+async def cancel_prescription(
+    prescription_id: UUID,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Cancel a draft or signed prescription
+    """
+    result = await db.execute(
+        select(Prescription).where(
+            Prescription.id == prescription_id,
+            Prescription.doctor_id == current_user.id
+        )
+    )
+    prescription = result.scalar_one_or_none()
+    
+    if not prescription:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Prescription not found"
+        )
+    
+    if prescription.status in ("cancelled", "dispensed"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Prescription already {prescription.status}"
+        )
+    
+    prescription.status = "cancelled"
+    
+    await record_prescription(db, prescription)
+    await db.commit()
+    await db.refresh(prescription)
     
     return PrescriptionResponse.from_orm(prescription)
 
 
 # =============== Helper Functions ===============
 
-def _validate_prescribing_rights(user: User, prescription_data: PrescriptionCreate):
+def _validate_prescribing_rights(user: Principal, prescription_data: PrescriptionCreate):
     """
     Validate that doctor has rights to prescribe these medications
     """
@@ -228,30 +368,12 @@ def _validate_prescribing_rights(user: User, prescription_data: PrescriptionCrea
     # No restriction here, but could add warning
 
 
-def _parse_medication_shorthand(shorthand: str) -> MedicationExpanded:
+def _parse_medication_shorthand(shorthand: str, kb: DrugKnowledgeBase) -> MedicationExpanded:
     """
     Parse medication shorthand into structured format
     Example: "Metf 1000 bd 30d" -> Metformin 1000mg, twice daily, 30 days
     """
-    # Medication database (in production, this would be a proper database)
-    MED_DB = {
-        "metf": {"generic": "METFORMIN", "forms": ["tablet"], "rxnorm": "6809"},
-        "amlo": {"generic": "AMLODIPINE", "forms": ["tablet"], "rxnorm": "17767"},
-        "aspi": {"generic": "ASPIRIN", "forms": ["tablet"], "rxnorm": "1191"},
-        "para": {"generic": "PARACETAMOL", "forms": ["tablet"], "rxnorm": "161"},
-    }
-    
-    # Frequency mapping
-    FREQ_MAP = {
-        "od": "Once daily",
-        "bd": "Twice daily",
-        "tid": "Three times daily",
-        "qid": "Four times daily",
-    }
-    
-    # Parse shorthand: "drug strength frequency duration"
-    pattern = r"(\w+)\s+(\d+)\s+(\w+)\s+(\d+)d"
-    match = re.match(pattern, shorthand.lower())
+    match = SHORTHAND_PATTERN.match(shorthand.lower())
     
     if not match:
         return None
@@ -259,130 +381,34 @@ def _parse_medication_shorthand(shorthand: str) -> MedicationExpanded:
     drug_code, strength, freq, duration = match.groups()
     
     # Look up drug
-    drug_info = MED_DB.get(drug_code)
-    if not drug_info:
+    drug = kb.abbreviations.get(drug_code)
+    if not drug:
         return None
     
-    frequency_text = FREQ_MAP.get(freq, freq.upper())
+    frequency = kb.frequencies.get(freq)
+    
+    # First listed form is the default; older master files may list none
+    dosage_form = drug.forms[0] if drug.forms else "tablet"
     
     return MedicationExpanded(
-        generic_name=drug_info["generic"],
+        generic_name=drug.generic_name,
         brand_suggestions=[],  # Would be populated from database
         strength=f"{strength}mg",
-        dosage_form="tablet",
+        dosage_form=dosage_form,
         route="oral",
-        frequency=frequency_text,
+        frequency=frequency.text if frequency else freq.upper(),
         duration_days=int(duration),
-        quantity=_calculate_quantity(freq, int(duration)),
+        quantity=_calculate_quantity(frequency, int(duration)),
         instructions="Take after meals",
-        rxnorm_code=drug_info.get("rxnorm")
+        rxnorm_code=drug.rxnorm
     )
 
 
-def _calculate_quantity(frequency: str, duration_days: int) -> int:
+def _calculate_quantity(frequency: Optional[Frequency], duration_days: int) -> int:
     """
     Calculate total quantity needed
     """
-    freq_multiplier = {
-        "od": 1,
-        "bd": 2,
-        "tid": 3,
-        "qid": 4
-    }
-    return freq_multiplier.get(frequency, 1) * duration_days
-
-
-def _check_drug_drug_interaction(med1: MedicationExpanded, med2: MedicationExpanded) -> Interaction:
-    """
-    Check for drug-drug interactions
-    In production, this would query a comprehensive drug interaction database
-    """
-    # Example interactions (simplified)
-    known_interactions = {
-        ("METFORMIN", "ASPIRIN"): {
-            "severity": "moderate",
-            "description": "Aspirin may enhance the hypoglycemic effect of Metformin",
-            "recommendation": "Monitor blood glucose levels closely"
-        }
-    }
-    
-    key = tuple(sorted([med1.generic_name, med2.generic_name]))
-    interaction_data = known_interactions.get(key)
-    
-    if interaction_data:
-        return Interaction(
-            type="drug_drug",
-            severity=interaction_data["severity"],
-            drug1=med1.generic_name,
-            drug2=med2.generic_name,
-            description=interaction_data["description"],
-            recommendation=interaction_data["recommendation"]
-        )
-    
-    return None
-
-
-def _check_herb_drug_interaction(ayush_med, allopathic_med: MedicationExpanded) -> Interaction:
-    """
-    Check for herb-drug interactions
-    """
-    # Example herb-drug interactions
-    herb_drug_interactions = {
-        ("Triphala", "METFORMIN"): {
-            "severity": "moderate",
-            "description": "Triphala may enhance hypoglycemic effects of Metformin",
-            "recommendation": "Monitor blood glucose levels closely. Consider adjusting doses."
-        },
-        ("Ashwagandha", "METFORMIN"): {
-            "severity": "moderate",
-            "description": "Ashwagandha may enhance hypoglycemic effects",
-            "recommendation": "Monitor blood glucose. Start with lower doses."
-        }
-    }
-    
-    key = (ayush_med.name, allopathic_med.generic_name)
-    interaction_data = herb_drug_interactions.get(key)
-    
-    if interaction_data:
-        return Interaction(
-            type="herb_drug",
-            severity=interaction_data["severity"],
-            drug1=ayush_med.name,
-            drug2=allopathic_med.generic_name,
-            description=interaction_data["description"],
-            recommendation=interaction_data["recommendation"],
-            references=["J Ethnopharmacol. 2015;179:190-197"]
-        )
-    
-    return None
-
-
-def _check_contraindication(med: MedicationExpanded, condition: str) -> dict:
-    """
-    Check for contraindications based on patient conditions
-    """
-    contraindications = {
-        ("METFORMIN", "kidney_disease"): "Contraindicated in severe renal impairment",
-        ("ASPIRIN", "bleeding_disorder"): "Contraindicated in active bleeding disorders"
-    }
-    
-    key = (med.generic_name, condition)
-    if key in contraindications:
-        return {
-            "medication": med.generic_name,
-            "condition": condition,
-            "severity": "critical",
-            "message": contraindications[key]
-        }
-    
-    return None
-
-
-def _is_allergic(med: MedicationExpanded, allergies: List[str]) -> bool:
-    """
-    Check if patient is allergic to medication
-    """
-    return med.generic_name.lower() in [allergy.lower() for allergy in allergies]
+    return (frequency.per_day if frequency else 1) * duration_days
 
 
 def _calculate_safety_score(interactions, contraindications, allergy_alerts) -> float:
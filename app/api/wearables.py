@@ -0,0 +1,78 @@
+"""
+Wearable Device API Endpoints
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from uuid import UUID
+
+from app.core.database import get_async_db
+from app.api.auth import get_current_user, Principal
+from app.core.live_vitals import vitals_broker
+from app.services.wearable_ingest import (
+    BatchConflict, IngestReport, claim_batch, complete_batch, ingest_stream, release_batch
+)
+
+router = APIRouter()
+
+INGEST_MEDIA_TYPES = ("application/x-ndjson", "text/csv")
+
+
+@router.post("/ingest", response_model=dict)
+async def ingest_wearable_data(
+    request: Request,
+    patient_id: Optional[UUID] = None,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Bulk-load wearable samples from an NDJSON or CSV body
+    
+    Rows: time, patient_id (or the `patient_id` query parameter), device_type,
+    metric_type, value, unit, metadata (NDJSON only). The body is validated
+    while it streams in and loaded with COPY in chunks; invalid rows are
+    skipped and reported, samples already stored are counted as duplicates.
+    
+    With an Idempotency-Key header, retrying a completed upload returns its
+    original report without reading the body.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in INGEST_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content-Type must be one of: {', '.join(INGEST_MEDIA_TYPES)}"
+        )
+    
+    if idempotency_key:
+        try:
+            stored = await claim_batch(db, idempotency_key, current_user.id)
+        except BatchConflict as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        if stored is not None:
+            return {**stored, "replayed": True}
+    
+    report = IngestReport()
+    try:
+        await ingest_stream(db, request.stream(), media_type, patient_id, report)
+    except Exception:
+        if idempotency_key:
+            await release_batch(db, idempotency_key)
+        raise
+    finally:
+        # Chunks committed before a failure are live too
+        for patient, samples in report.latest.items():
+            vitals_broker.publish(patient, samples)
+    
+    if report.aborted:
+        if idempotency_key:
+            await release_batch(db, idempotency_key)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=report.as_dict()
+        )
+    
+    result = report.as_dict()
+    if idempotency_key:
+        await complete_batch(db, idempotency_key, result)
+    return result
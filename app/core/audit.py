@@ -0,0 +1,200 @@
+"""
+Asynchronous batched audit-log writer
+"""
+from dataclasses import dataclass, field, asdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+import asyncio
+import logging
+
+from sqlalchemy import insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from app.core.config import settings
+from app.core.database import async_engine
+from app.core.metrics import AUDIT_EVENTS, AUDIT_QUEUE_DEPTH
+from app.models.database import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Failures that say nothing about the rows: retry the same batch
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)
+
+RETRY_INITIAL_BACKOFF_SECONDS = 0.5
+
+
+@dataclass
+class AuditEvent:
+    action: str
+    user_id: Optional[UUID] = None
+    resource_type: Optional[str] = None
+    resource_id: Optional[UUID] = None
+    ip_address: Optional[str] = None
+    user_agent: Optional[str] = None
+    request_data: Optional[Dict[str, Any]] = None
+    response_status: Optional[int] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class AuditSink:
+    """
+    Queues audit events in memory and writes them with one multi-row INSERT
+    per batch, flushing when `batch_size` events are waiting or every
+    `flush_interval` seconds. The queue is bounded: producers wait up to
+    `enqueue_timeout` for space, after which the event is dropped and counted.
+
+    A batch that fails on a connection error is retried with backoff while
+    the queue backs up behind it; events are only dropped on queue overflow,
+    at shutdown, or when the database rejects the row itself.
+    """
+
+    def __init__(
+        self,
+        max_queue: int,
+        batch_size: int,
+        flush_interval: float,
+        enqueue_timeout: float,
+        max_backoff: float,
+        shutdown_attempts: int
+    ):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_backoff = max_backoff
+        self.shutdown_attempts = shutdown_attempts
+        self.enqueued_total = 0
+        self.flushed_total = 0
+        self.dropped_total = 0
+        self.failed_batches = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.queued,
+            "enqueued_total": self.enqueued_total,
+            "flushed_total": self.flushed_total,
+            "dropped_total": self.dropped_total,
+            "failed_batches": self.failed_batches,
+        }
+
+    async def record(self, event: AuditEvent) -> bool:
+        """
+        Enqueue an event, waiting briefly for space when the queue is full
+        """
+        if self._queue is None:
+            self.dropped_total += 1
+            AUDIT_EVENTS.labels(outcome="dropped").inc()
+            logger.warning(f"Audit sink not running, dropped event: {event.action}")
+            return False
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(event), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.dropped_total += 1
+                AUDIT_EVENTS.labels(outcome="dropped").inc()
+                return False
+        self.enqueued_total += 1
+        AUDIT_EVENTS.labels(outcome="enqueued").inc()
+        AUDIT_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._stopping = False
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Drain everything still queued to the database, then stop
+        """
+        if self._runner is None:
+            return
+        self._stopping = True
+        await self._runner
+        self._runner = None
+        self._queue = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[AuditEvent] = []
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval))
+            except asyncio.TimeoutError:
+                pass
+
+            # Fill the batch until it is full or the oldest event is flush_interval old
+            deadline = loop.time() + self.flush_interval
+            while batch and len(batch) < self.batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0 or self._stopping:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            if batch:
+                await self._flush(batch)
+            AUDIT_QUEUE_DEPTH.set(self._queue.qsize())
+            if self._stopping and self._queue.empty():
+                return
+
+    def _drop(self, count: int):
+        self.dropped_total += count
+        AUDIT_EVENTS.labels(outcome="dropped").inc(count)
+
+    async def _flush(self, batch: List[AuditEvent]):
+        attempt = 0
+        while True:
+            try:
+                async with async_engine.begin() as conn:
+                    await conn.execute(insert(AuditLog), [asdict(event) for event in batch])
+                break
+            except TRANSIENT_ERRORS as e:
+                attempt += 1
+                self.failed_batches += 1
+                if self._stopping and attempt >= self.shutdown_attempts:
+                    self._drop(len(batch))
+                    logger.error(f"Audit batch of {len(batch)} events dropped at shutdown: {e}")
+                    return
+                delay = min(RETRY_INITIAL_BACKOFF_SECONDS * 2 ** (attempt - 1), self.max_backoff)
+                logger.warning(f"Audit batch of {len(batch)} events failed (attempt {attempt}), retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                self.failed_batches += 1
+                if len(batch) == 1:
+                    self._drop(1)
+                    logger.error(f"Audit event rejected by the database, dropped: {batch[0].action}: {e}")
+                    return
+                # Retrying would fail the same way: write rows singly so only
+                # the offending event is lost
+                logger.error(f"Audit batch of {len(batch)} events rejected, writing events singly: {e}")
+                for event in batch:
+                    await self._flush([event])
+                return
+        self.flushed_total += len(batch)
+        AUDIT_EVENTS.labels(outcome="flushed").inc(len(batch))
+
+
+audit_sink = AuditSink(
+    max_queue=settings.AUDIT_QUEUE_MAX_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    enqueue_timeout=settings.AUDIT_ENQUEUE_TIMEOUT_SECONDS,
+    max_backoff=settings.AUDIT_RETRY_MAX_BACKOFF_SECONDS,
+    shutdown_attempts=settings.AUDIT_SHUTDOWN_ATTEMPTS
+)
@@ -0,0 +1,175 @@
+"""
+In-process caches and cross-worker invalidation
+"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire after `ttl` seconds
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class InvalidationBus:
+    """
+    Fans cache invalidations out to every worker through Redis pub/sub.
+
+    Handlers are registered per topic. publish() runs local handlers
+    immediately and broadcasts to other processes; without Redis the bus
+    degrades to local-only invalidation.
+    """
+
+    def __init__(self, redis_url: str, channel: str, enabled: bool = True):
+        self.redis_url = redis_url
+        self.channel = channel
+        self.enabled = enabled
+        self._origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def client(self):
+        """
+        The connected async Redis client, or None (disabled or unreachable)
+        """
+        return self._redis
+
+    def subscribe(self, topic: str, handler: Callable[[str], None]):
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def _dispatch(self, topic: str, key: str):
+        for handler in self._handlers.get(topic, []):
+            try:
+                handler(key)
+            except Exception as e:
+                logger.error(f"Invalidation handler failed for {topic}:{key}: {e}")
+
+    def publish(self, topic: str, key: str):
+        """
+        Invalidate locally and broadcast (safe to call from sync code)
+        """
+        self._dispatch(topic, key)
+        if not self.enabled:
+            return
+        message = json.dumps({"origin": self._origin, "topic": topic, "key": key})
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if loop is not None and self._redis is not None:
+            loop.create_task(self._publish_async(message))
+        elif loop is None:
+            # Scripts and jobs have no running loop: publish synchronously
+            try:
+                import redis
+                redis.Redis.from_url(self.redis_url).publish(self.channel, message)
+            except Exception as e:
+                logger.warning(f"Cache invalidation not broadcast: {e}")
+
+    async def _publish_async(self, message: str):
+        try:
+            await self._redis.publish(self.channel, message)
+        except Exception as e:
+            logger.warning(f"Cache invalidation not broadcast: {e}")
+
+    async def start(self):
+        if not self.enabled:
+            return
+        try:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.Redis.from_url(self.redis_url)
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(self.channel)
+        except Exception as e:
+            logger.warning(f"Invalidation bus disabled, Redis unavailable: {e}")
+            self._redis = None
+            return
+        self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub):
+        try:
+            async for message in pubsub.listen():
+                try:
+                    payload = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                if payload.get("origin") != self._origin:
+                    self._dispatch(payload.get("topic"), payload.get("key"))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Invalidation bus listener stopped: {e}")
+        finally:
+            await pubsub.reset()
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+invalidation_bus = InvalidationBus(
+    settings.REDIS_URL,
+    settings.CACHE_INVALIDATION_CHANNEL,
+    enabled=settings.CACHE_INVALIDATION_ENABLED
+)
@@ -1,30 +1,263 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, Select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
-from typing import Generator
+from contextlib import contextmanager
+from typing import AsyncGenerator, Dict, Generator, List, Optional
+import itertools
+import logging
+import time
+from app.core.cache import TTLCache, invalidation_bus
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+from app.core.request_context import get_request_context
 
-# Create database engine
+logger = logging.getLogger(__name__)
+
+
+def _async_database_url(url: str) -> str:
+    """
+    Rewrite a sync PostgreSQL URL to use the asyncpg driver
+    """
+    parsed = make_url(url)
+    if parsed.drivername in ("postgresql", "postgresql+psycopg2", "postgres"):
+        parsed = parsed.set(drivername="postgresql+asyncpg")
+    return parsed.render_as_string(hide_password=False)
+
+
+def _create_api_engine(url: str):
+    return create_async_engine(
+        _async_database_url(url),
+        pool_pre_ping=True,
+        pool_size=10,
+        max_overflow=20,
+        echo=settings.DEBUG
+    )
+
+
+# Create async database engines (used by the API)
+async_engine = _create_api_engine(settings.DATABASE_URL)
+
+replica_engines: List = [
+    _create_api_engine(url.strip())
+    for url in settings.DATABASE_REPLICA_URLS.split(",")
+    if url.strip()
+]
+
+
+# =============== Statement instrumentation ===============
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# Statement lists registered by query_budget(); fed from every engine
+_query_observers: List[List[str]] = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    ctx = get_request_context()
+    ctx.sql_count += 1
+    ctx.sql_time += elapsed
+    # Statements are already parameterised, so the text is the statement shape
+    ctx.sql_shapes[statement] += 1
+    for observer in _query_observers:
+        observer.append(statement)
+
+
+def instrument_statements(sync_engine):
+    """
+    Count statements and DB time into the current request context
+    """
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def repeated_statements(ctx=None, threshold: Optional[int] = None) -> Dict[str, int]:
+    """
+    Statement shapes run at least `threshold` times in one request (likely N+1)
+    """
+    ctx = ctx or get_request_context()
+    threshold = threshold or settings.SQL_N_PLUS_ONE_THRESHOLD
+    return {shape: count for shape, count in ctx.sql_shapes.items() if count >= threshold}
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """
+    Test guard: fail if the block executes more than `max_queries` statements
+
+        with query_budget(3):
+            client.get(f"/api/v1/clinical/health-graph/{patient_id}")
+    """
+    statements: List[str] = []
+    _query_observers.append(statements)
+    try:
+        yield statements
+    finally:
+        _query_observers.remove(statements)
+    if len(statements) > max_queries:
+        listing = "\n".join(statements)
+        raise QueryBudgetExceeded(f"{len(statements)} statements executed, budget was {max_queries}:\n{listing}")
+
+
+instrument_engine(async_engine.sync_engine, "primary")
+instrument_statements(async_engine.sync_engine)
+for _index, _replica in enumerate(replica_engines):
+    instrument_engine(_replica.sync_engine, f"replica-{_index}")
+    instrument_statements(_replica.sync_engine)
+
+_replica_cycle = itertools.cycle(range(len(replica_engines))) if replica_engines else None
+
+# =============== Read-your-writes pinning ===============
+
+# A write pins its user to the primary for DATABASE_PRIMARY_STICKY_SECONDS.
+# Pins live in Redis (the invalidation bus client) so every worker honours
+# them, with a per-worker copy that keeps this worker consistent when Redis
+# is unreachable.
+PRIMARY_PIN_PREFIX = "integmed:primary-pin:"
+
+_local_pins = TTLCache(10000, settings.DATABASE_PRIMARY_STICKY_SECONDS)
+
+
+async def load_primary_pin(user_id: str):
+    """
+    Pin this request's reads to the primary if the user wrote, on any
+    worker, within the sticky window
+    """
+    ctx = get_request_context()
+    if not replica_engines or ctx.pinned_to_primary:
+        return
+    if _local_pins.get(user_id):
+        ctx.pinned_to_primary = True
+        return
+    client = invalidation_bus.client
+    if client is None:
+        return
+    try:
+        ctx.pinned_to_primary = bool(await client.exists(PRIMARY_PIN_PREFIX + user_id))
+    except Exception as e:
+        # Unknown pin state: stay consistent at the primary's expense
+        logger.warning(f"Primary pin lookup failed, reading from primary: {e}")
+        ctx.pinned_to_primary = True
+
+
+async def publish_primary_pin(ctx):
+    """
+    Share the pin for a request that wrote; called before its response is sent
+    """
+    if not (replica_engines and ctx.wrote_primary and ctx.user_id):
+        return
+    ctx.wrote_primary = False
+    client = invalidation_bus.client
+    if client is None:
+        return
+    try:
+        await client.set(PRIMARY_PIN_PREFIX + ctx.user_id, 1, ex=settings.DATABASE_PRIMARY_STICKY_SECONDS)
+    except Exception as e:
+        logger.warning(f"Primary pin not shared with other workers: {e}")
+
+
+class RoutingSession(Session):
+    """
+    Sends writes and flushes to the primary. Sessions opened with
+    info={"read_only": True} send SELECTs to one replica per session,
+    unless the current user wrote within the sticky window or the statement
+    is executed with bind_arguments={"primary": True}.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        ctx = get_request_context()
+        use_replica = (
+            replica_engines
+            and self.info.get("read_only")
+            and not self._flushing
+            and isinstance(clause, Select)
+            and not ctx.pinned_to_primary
+            and not kw.get("primary")
+        )
+        if not use_replica:
+            ctx.db_nodes.add("primary")
+            return async_engine.sync_engine
+
+        if "replica" not in self.info:
+            self.info["replica"] = next(_replica_cycle)
+        index = self.info["replica"]
+        ctx.db_nodes.add(f"replica-{index}")
+        return replica_engines[index].sync_engine
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_user_write(session, flush_context):
+    ctx = get_request_context()
+    if ctx.user_id:
+        _local_pins.set(ctx.user_id, True)
+        ctx.pinned_to_primary = True
+        ctx.wrote_primary = True
+
+
+# Create async session factory
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# Create sync database engine (scripts, migrations and maintenance jobs only)
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=2,
+    max_overflow=0,
     echo=settings.DEBUG
 )
 
-# Create session factory
+instrument_statements(engine)
+
+# Create sync session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create base class for models
 Base = declarative_base()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for async database sessions (always on the primary)
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency for read-only handlers; SELECTs may be served by a replica
+    """
+    async with AsyncSessionLocal(info={"read_only": True}) as db:
+        yield db
+
+
+async def dispose_engines():
+    """
+    Close all API connection pools
+    """
+    await async_engine.dispose()
+    for replica in replica_engines:
+        await replica.dispose()
+
+
 def get_db() -> Generator[Session, None, None]:
     """
-    Dependency for database sessions
+    Sync database session for scripts (not for use in async endpoints)
     """
     db = SessionLocal()
     try:
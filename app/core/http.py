@@ -0,0 +1,172 @@
+"""
+Shared HTTP clients for upstream services (HPR)
+"""
+from typing import Dict, Optional
+import logging
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import UPSTREAM_LATENCY
+from app.core.request_context import get_request_context
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(httpx.RequestError):
+    """
+    Raised without touching the network while an upstream's circuit is open
+    """
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed -> open after `failure_threshold` failures; open -> half-open after
+    `reset_timeout` seconds, where a single trial request decides whether the
+    circuit closes again or re-opens.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Give up a half-open trial that ended without a verdict (cancelled,
+        non-network error) so the next request can try again
+        """
+        self._trial_in_flight = False
+
+
+class UpstreamClient:
+    """
+    Keep-alive connection pool plus circuit breaker for one upstream
+    """
+
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.CIRCUIT_BREAKER_RESET_SECONDS
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        http2 = settings.HTTP2_ENABLED
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning(f"HTTP/2 requested for {self.name} but 'h2' is not installed; using HTTP/1.1")
+                http2 = False
+
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(self.timeout, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            headers={"Content-Type": "application/json"}
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if self._client is None:
+            raise CircuitOpenError(f"{self.name} client is not started")
+        if not self.breaker.allow():
+            UPSTREAM_LATENCY.labels(upstream=self.name, outcome="circuit_open").observe(0)
+            raise CircuitOpenError(f"{self.name} circuit open")
+
+        request_id = get_request_context().request_id
+        if request_id:
+            kwargs["headers"] = {"X-Request-ID": request_id, **(kwargs.get("headers") or {})}
+
+        start = time.perf_counter()
+        try:
+            response = await self._client.request(method, url, **kwargs)
+        except httpx.RequestError:
+            self.breaker.record_failure()
+            UPSTREAM_LATENCY.labels(upstream=self.name, outcome="error").observe(time.perf_counter() - start)
+            raise
+        except BaseException:
+            # Cancelled (client went away) or not a network failure: no verdict
+            self.breaker.release()
+            raise
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            outcome = "server_error"
+        else:
+            self.breaker.record_success()
+            outcome = "ok"
+        UPSTREAM_LATENCY.labels(upstream=self.name, outcome=outcome).observe(time.perf_counter() - start)
+        return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+
+upstreams: Dict[str, UpstreamClient] = {
+    "hpr": UpstreamClient("hpr", timeout=settings.HPR_TIMEOUT_SECONDS),
+}
+
+
+async def start_upstreams():
+    for client in upstreams.values():
+        await client.start()
+
+
+async def close_upstreams():
+    for client in upstreams.values():
+        await client.close()
+
+
+def get_hpr_client() -> UpstreamClient:
+    """
+    Dependency for the shared HPR client
+    """
+    return upstreams["hpr"]
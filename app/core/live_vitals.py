@@ -0,0 +1,100 @@
+"""
+Live vitals fan-out
+
+Ingest publishes the latest sample per (device, metric) of each patient once
+per batch. Messages travel over Redis pub/sub (an InvalidationBus on its own
+channel) so every worker delivers them to its local WebSocket subscribers;
+without Redis delivery is local to the publishing worker.
+
+Each subscription holds at most one pending value per series, bounded by
+LIVE_VITALS_MAX_SERIES: a client that falls behind receives the latest value
+of each series, never a backlog.
+"""
+from typing import Any, Dict, List, Set
+import asyncio
+import json
+import logging
+
+from app.core.cache import InvalidationBus
+from app.core.config import settings
+from app.core.metrics import LIVE_VITALS_REJECTED, LIVE_VITALS_SUPERSEDED
+
+logger = logging.getLogger(__name__)
+
+
+class VitalsSubscription:
+    """
+    One client's pending delta: latest sample per "device_type:metric_type"
+    """
+
+    def __init__(self, max_series: int):
+        self.max_series = max_series
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, samples: Dict[str, Dict[str, Any]]):
+        for key, sample in samples.items():
+            current = self._pending.get(key)
+            if current is not None:
+                if current["time"] > sample["time"]:
+                    continue
+                LIVE_VITALS_SUPERSEDED.inc()
+            elif len(self._pending) >= self.max_series:
+                # Nothing newer replaced this one: the series is lost for this delta
+                LIVE_VITALS_REJECTED.inc()
+                continue
+            self._pending[key] = sample
+        if self._pending:
+            self._ready.set()
+
+    async def next_delta(self) -> List[Dict[str, Any]]:
+        """
+        Wait for pending samples and take all of them
+        """
+        await self._ready.wait()
+        self._ready.clear()
+        pending, self._pending = self._pending, {}
+        return list(pending.values())
+
+
+class VitalsBroker:
+    def __init__(self, bus: InvalidationBus):
+        self.bus = bus
+        self._subscribers: Dict[str, Set[VitalsSubscription]] = {}
+        bus.subscribe("vitals", self._deliver)
+
+    def subscribe(self, patient_id) -> VitalsSubscription:
+        subscription = VitalsSubscription(settings.LIVE_VITALS_MAX_SERIES)
+        self._subscribers.setdefault(str(patient_id), set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, patient_id, subscription: VitalsSubscription):
+        key = str(patient_id)
+        subscribers = self._subscribers.get(key)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[key]
+
+    def _deliver(self, message: str):
+        try:
+            payload = json.loads(message)
+        except (TypeError, ValueError):
+            return
+        for subscription in self._subscribers.get(payload.get("patient_id"), ()):
+            subscription.offer(payload["samples"])
+
+    def publish(self, patient_id, samples: Dict[str, Dict[str, Any]]):
+        """
+        Deliver to local subscribers and broadcast to other workers
+        """
+        if samples:
+            self.bus.publish("vitals", json.dumps({"patient_id": str(patient_id), "samples": samples}))
+
+
+vitals_broker = VitalsBroker(InvalidationBus(
+    settings.REDIS_URL,
+    settings.LIVE_VITALS_CHANNEL,
+    enabled=settings.LIVE_VITALS_REDIS_ENABLED
+))
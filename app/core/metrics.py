@@ -0,0 +1,164 @@
+"""
+Prometheus metrics
+
+Under gunicorn each worker writes to PROMETHEUS_MULTIPROC_DIR (set up in
+gunicorn.conf.py) and /metrics aggregates all workers on every scrape.
+"""
+from typing import Tuple
+import os
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "HTTP response body size by route template",
+    ["route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the SQLAlchemy pool",
+    ["node"],
+    multiprocess_mode="livesum"
+)
+
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections",
+    "Connections open beyond pool_size",
+    ["node"],
+    multiprocess_mode="livesum"
+)
+
+DB_NODE_REQUESTS = Counter(
+    "db_node_requests_total",
+    "Requests that used each database node",
+    ["node"]
+)
+
+DB_STATEMENTS_PER_REQUEST = Histogram(
+    "db_statements_per_request",
+    "SQL statements executed per request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds",
+    "Time spent executing SQL per request",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+DB_N_PLUS_ONE = Counter(
+    "db_n_plus_one_suspected_total",
+    "Requests that repeated one statement shape at least SQL_N_PLUS_ONE_THRESHOLD times",
+    ["route"]
+)
+
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Latency of calls to upstream services (HPR, ABDM)",
+    ["upstream", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+)
+
+WEARABLE_INGEST_ROWS = Counter(
+    "wearable_ingest_rows_total",
+    "Wearable samples received by bulk ingest, by outcome",
+    ["outcome"]
+)
+
+WEARABLE_ANOMALY_SAMPLES = Counter(
+    "wearable_anomaly_samples_total",
+    "Wearable samples scored by the anomaly detector"
+)
+
+WEARABLE_ANOMALY_EPISODES = Counter(
+    "wearable_anomaly_episodes_total",
+    "Anomaly episodes written as FHIR Observations, by kind",
+    ["kind"]
+)
+
+LIVE_VITALS_CONNECTIONS = Gauge(
+    "live_vitals_connections",
+    "Open live vitals WebSocket connections",
+    multiprocess_mode="livesum"
+)
+
+LIVE_VITALS_SUPERSEDED = Counter(
+    "live_vitals_superseded_total",
+    "Live vitals updates replaced by a newer value before a slow client received them"
+)
+
+LIVE_VITALS_REJECTED = Counter(
+    "live_vitals_rejected_total",
+    "Live vitals updates for a new series dropped because the client already had LIVE_VITALS_MAX_SERIES pending"
+)
+
+INTERACTION_CACHE_REQUESTS = Counter(
+    "interaction_cache_requests_total",
+    "Interaction checks by cache outcome (local_hit, shared_hit, miss); hit ratio = hits / all",
+    ["outcome"]
+)
+
+AUDIT_EVENTS = Counter(
+    "audit_events_total",
+    "Audit events by outcome",
+    ["outcome"]
+)
+
+AUDIT_QUEUE_DEPTH = Gauge(
+    "audit_queue_depth",
+    "Audit events waiting to be flushed",
+    multiprocess_mode="livesum"
+)
+
+
+def instrument_engine(engine, node: str):
+    """
+    Track pool checkout/overflow gauges for an engine
+    """
+    pool = engine.pool
+
+    def _update(*args):
+        DB_POOL_CHECKED_OUT.labels(node=node).set(pool.checkedout())
+        DB_POOL_OVERFLOW.labels(node=node).set(max(0, pool.overflow()))
+
+    event.listen(engine, "checkout", _update)
+    event.listen(engine, "checkin", _update)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Exposition payload for /metrics
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
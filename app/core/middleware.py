@@ -0,0 +1,162 @@
+"""
+Pure-ASGI middleware
+
+These wrap `send` instead of using BaseHTTPMiddleware, so there is no extra
+task or memory stream per request and streaming responses pass straight
+through.
+"""
+from typing import Dict, Tuple
+import logging
+import time
+import uuid
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.database import publish_primary_pin, repeated_statements
+from app.core.metrics import (
+    REQUEST_LATENCY,
+    REQUESTS_IN_PROGRESS,
+    RESPONSE_SIZE,
+    DB_NODE_REQUESTS,
+    DB_STATEMENTS_PER_REQUEST,
+    DB_TIME_PER_REQUEST,
+    DB_N_PLUS_ONE,
+)
+from app.core.request_context import bind_request_context, get_request_context
+
+logger = logging.getLogger(__name__)
+
+
+class RequestIdLogFilter(logging.Filter):
+    """
+    Adds the current request id to every log record as `request_id`
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = get_request_context().request_id or "-"
+        return True
+
+
+class RequestMetricsMiddleware:
+    """
+    Binds the request context, propagates X-Request-ID, adds X-Process-Time /
+    X-DB-Node (and, in debug, X-DB-Query-Count / X-DB-Time) headers, records
+    Prometheus metrics and logs slow requests and likely N+1 query patterns
+    """
+
+    def __init__(self, app: ASGIApp, slow_request_seconds: float = 1.0):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        ctx = bind_request_context()
+        ctx.request_id = Headers(scope=scope).get("x-request-id") or uuid.uuid4().hex
+        method = scope["method"]
+        status_code = 500
+        body_size = 0
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, body_size
+            if message["type"] == "http.response.start":
+                # The client may read again as soon as it sees this response
+                await publish_primary_pin(ctx)
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Process-Time", str(time.perf_counter() - start_time))
+                headers.append("X-Request-ID", ctx.request_id)
+                if ctx.db_nodes:
+                    headers.append("X-DB-Node", ",".join(sorted(ctx.db_nodes)))
+                if settings.DEBUG:
+                    headers.append("X-DB-Query-Count", str(ctx.sql_count))
+                    headers.append("X-DB-Time", f"{ctx.sql_time:.6f}")
+            elif message["type"] == "http.response.body":
+                body_size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            # Writes made after the response started (streaming bodies)
+            await publish_primary_pin(ctx)
+            process_time = time.perf_counter() - start_time
+
+            # Label by route template, never the raw path, to bound cardinality
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            REQUEST_LATENCY.labels(method=method, route=route_path, status=status_code).observe(process_time)
+            RESPONSE_SIZE.labels(route=route_path).observe(body_size)
+            for node in ctx.db_nodes:
+                DB_NODE_REQUESTS.labels(node=node).inc()
+            DB_STATEMENTS_PER_REQUEST.labels(route=route_path).observe(ctx.sql_count)
+            DB_TIME_PER_REQUEST.labels(route=route_path).observe(ctx.sql_time)
+
+            repeated = repeated_statements(ctx)
+            if repeated:
+                DB_N_PLUS_ONE.labels(route=route_path).inc()
+                for shape, count in repeated.items():
+                    logger.warning(f"Likely N+1 on {method} {route_path}: {count}x {shape[:200]}")
+
+            if process_time > self.slow_request_seconds:
+                logger.warning(f"Slow request: {method} {scope['path']} took {process_time:.2f}s")
+
+
+class PreflightCacheMiddleware:
+    """
+    Answers repeated CORS preflight requests from cache.
+
+    Sits in front of CORSMiddleware; the first preflight for an
+    (origin, method, headers) combination is computed by CORSMiddleware and
+    its response replayed for later identical preflights.
+    """
+
+    def __init__(self, app: ASGIApp, max_entries: int = 512):
+        self.app = app
+        self.max_entries = max_entries
+        self._cache: Dict[Tuple[str, str, str], Tuple[int, list, bytes]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        origin = headers.get("origin")
+        requested_method = headers.get("access-control-request-method")
+        if origin is None or requested_method is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = (origin, requested_method, headers.get("access-control-request-headers", ""))
+        cached = self._cache.get(key)
+        if cached is not None:
+            status, raw_headers, body = cached
+            await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        response: Dict = {"body": b""}
+
+        async def capture(message: Message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                response["body"] += message.get("body", b"")
+            await send(message)
+
+        await self.app(scope, receive, capture)
+
+        if response.get("status") == 200:
+            if len(self._cache) >= self.max_entries:
+                self._cache.clear()
+            self._cache[key] = (response["status"], response["headers"], response["body"])
@@ -0,0 +1,46 @@
+"""
+Request-scoped state shared by middleware, dependencies and the data layer
+"""
+from contextvars import ContextVar
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional, Set
+
+
+@dataclass
+class RequestContext:
+    """
+    Mutable per-request holder. The middleware binds one instance per request;
+    child tasks copy the context variable but share the same object.
+    """
+    request_id: Optional[str] = None
+    user_id: Optional[str] = None
+    # Read-your-writes: reads go to the primary; wrote_primary is set until the pin is shared
+    pinned_to_primary: bool = False
+    wrote_primary: bool = False
+    db_nodes: Set[str] = field(default_factory=set)
+    sql_count: int = 0
+    sql_time: float = 0.0
+    sql_shapes: Counter = field(default_factory=Counter)
+
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+def bind_request_context() -> RequestContext:
+    """
+    Start a new request context for the current task
+    """
+    ctx = RequestContext()
+    _request_context.set(ctx)
+    return ctx
+
+
+def get_request_context() -> RequestContext:
+    """
+    Current request context (a detached instance outside of requests)
+    """
+    ctx = _request_context.get()
+    if ctx is None:
+        return RequestContext()
+    return ctx
@@ -0,0 +1,71 @@
+"""
+audit_logs partition maintenance
+
+Creates upcoming monthly partitions and detaches (archives or drops) the ones
+past retention. Runs periodically inside the API (one worker at a time, via an
+advisory lock) and can be run by hand:
+
+    python -m app.jobs.audit_partitions
+"""
+from typing import Dict
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import async_engine
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant identifying this job's advisory lock
+_LOCK_KEY = 7_310_042
+
+
+async def run_maintenance() -> Dict:
+    """
+    Run one maintenance pass; returns what was changed
+    """
+    async with async_engine.begin() as conn:
+        locked = await conn.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        if not locked:
+            return {"skipped": True}
+
+        created = await conn.scalar(
+            text("SELECT audit_logs_create_partitions(current_date, :ahead)"),
+            {"ahead": settings.AUDIT_PARTITIONS_AHEAD_MONTHS}
+        )
+        result = await conn.execute(
+            text("SELECT * FROM audit_logs_detach_partitions(:months, :archive)"),
+            {"months": settings.AUDIT_RETENTION_MONTHS, "archive": settings.AUDIT_ARCHIVE_EXPIRED}
+        )
+        detached = list(result.scalars())
+
+    if created or detached:
+        logger.info(f"audit_logs partitions: created {created}, detached {detached}")
+    return {"created": created, "detached": detached}
+
+
+async def maintenance_loop():
+    """
+    Background task started from the app lifespan
+    """
+    interval = settings.AUDIT_MAINTENANCE_INTERVAL_HOURS * 3600
+    while True:
+        try:
+            await run_maintenance()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"audit_logs partition maintenance failed: {e}")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def _main():
+        print(await run_maintenance())
+        await async_engine.dispose()
+
+    asyncio.run(_main())
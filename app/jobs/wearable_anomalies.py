@@ -0,0 +1,220 @@
+"""
+Wearable vital-sign anomaly detection
+
+Each pass picks up the series (patient, device, metric) that received rows
+since the job's watermark on wearable_data.created_at, loads each series'
+recent window as NumPy arrays (one aggregated row per series), scores it
+with app.services.vital_anomalies and upserts flagged episodes as FHIR
+Observations in fhir_resources with source='wearable'. Runs inside the API
+(one worker at a time, via an advisory lock) and can be run by hand:
+
+    python -m app.jobs.wearable_anomalies
+"""
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Tuple
+import asyncio
+import logging
+import time
+
+import numpy as np
+from sqlalchemy import Float, cast, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, async_engine
+from app.core.metrics import WEARABLE_ANOMALY_EPISODES, WEARABLE_ANOMALY_SAMPLES
+from app.models.database import FHIRResource, JobWatermark, WearableData
+from app.services.vital_anomalies import RULES, Episode, detect_episodes, episode_observation, episode_resource_id
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "wearable_anomalies"
+
+# Arbitrary constant identifying this job's advisory lock
+_LOCK_KEY = 7_310_044
+
+SOURCE = "wearable"
+
+
+async def _dirty_series(db: AsyncSession, watermark: datetime, upper: datetime) -> List[Tuple]:
+    """
+    (patient_id, device_type, metric_type, first new sample time) of every
+    scored series with rows committed in (watermark, upper]
+    """
+    result = await db.execute(
+        select(
+            WearableData.patient_id,
+            WearableData.device_type,
+            WearableData.metric_type,
+            func.min(WearableData.time)
+        )
+        .where(
+            WearableData.metric_type.in_(list(RULES)),
+            # Bounds the scan to recent chunks / partitions
+            WearableData.time >= upper - timedelta(hours=settings.WEARABLE_ANOMALY_LOOKBACK_HOURS),
+            WearableData.created_at > watermark,
+            WearableData.created_at <= upper
+        )
+        .group_by(WearableData.patient_id, WearableData.device_type, WearableData.metric_type)
+    )
+    return list(result.tuples())
+
+
+async def _load_series(db: AsyncSession, batch: List[Tuple]) -> Dict[Tuple, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Ascending (epoch seconds, value) arrays per series, from the baseline
+    window before its first new sample; aggregated in SQL to one row each
+    """
+    since = min(first_new for *_, first_new in batch) - timedelta(minutes=settings.WEARABLE_ANOMALY_BASELINE_MINUTES)
+    epoch = cast(func.extract("epoch", WearableData.time), Float)
+    result = await db.execute(
+        select(
+            WearableData.patient_id,
+            WearableData.device_type,
+            WearableData.metric_type,
+            func.array_agg(aggregate_order_by(epoch, WearableData.time)),
+            func.array_agg(aggregate_order_by(cast(WearableData.value, Float), WearableData.time))
+        )
+        .where(
+            tuple_(WearableData.patient_id, WearableData.device_type, WearableData.metric_type).in_(
+                [key[:3] for key in batch]
+            ),
+            WearableData.time >= since,
+            WearableData.value.isnot(None)
+        )
+        .group_by(WearableData.patient_id, WearableData.device_type, WearableData.metric_type)
+    )
+    return {
+        (patient_id, device_type, metric_type): (np.asarray(times, dtype=np.float64), np.asarray(values, dtype=np.float64))
+        for patient_id, device_type, metric_type, times, values in result.tuples()
+    }
+
+
+async def _upsert_observations(db: AsyncSession, found: List[Tuple[Tuple, Episode]]):
+    """
+    Insert new episode Observations and update ones that grew since last pass
+    """
+    by_id = {episode_resource_id(*key, episode): (key, episode) for key, episode in found}
+    result = await db.execute(
+        select(FHIRResource).where(
+            FHIRResource.resource_id.in_(list(by_id)),
+            FHIRResource.source == SOURCE
+        )
+    )
+    existing = {row.resource_id: row for row in result.scalars()}
+
+    for resource_id, (key, episode) in by_id.items():
+        patient_id, device_type, metric_type = key
+        observation = episode_observation(patient_id, device_type, metric_type, episode)
+        row = existing.get(resource_id)
+        if row is None:
+            row = FHIRResource(
+                resource_type="Observation",
+                resource_id=resource_id,
+                patient_id=patient_id,
+                category="vital-signs",
+                code=RULES[metric_type].loinc[0],
+                source=SOURCE,
+                source_system=device_type
+            )
+            db.add(row)
+            WEARABLE_ANOMALY_EPISODES.labels(kind=RULES[metric_type].kind).inc()
+        row.resource = observation
+        row.effective_date = datetime.fromtimestamp(episode.start, tz=timezone.utc).date()
+        # Numeric column: a float would be stored with its binary expansion
+        row.value_numeric = Decimal(f"{episode.peak:.2f}")
+        row.value_text = RULES[metric_type].kind
+
+
+async def run_detection() -> Dict:
+    """
+    Run one detection pass; returns what was scored and flagged
+    """
+    started = time.perf_counter()
+    scored = 0
+    scoring_seconds = 0.0
+    found: List[Tuple[Tuple, Episode]] = []
+
+    async with AsyncSessionLocal() as db:
+        locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        if not locked:
+            return {"skipped": True}
+
+        now = await db.scalar(select(func.now()))
+        upper = now - timedelta(seconds=settings.WEARABLE_ANOMALY_LAG_SECONDS)
+        watermark = await db.scalar(select(JobWatermark.watermark).where(JobWatermark.job_name == JOB_NAME))
+        if watermark is None:
+            watermark = upper - timedelta(hours=settings.WEARABLE_ANOMALY_LOOKBACK_HOURS)
+
+        dirty = await _dirty_series(db, watermark, upper)
+        for offset in range(0, len(dirty), settings.WEARABLE_ANOMALY_BATCH_SERIES):
+            batch = dirty[offset:offset + settings.WEARABLE_ANOMALY_BATCH_SERIES]
+            arrays = await _load_series(db, batch)
+
+            scoring_started = time.perf_counter()
+            for patient_id, device_type, metric_type, first_new in batch:
+                key = (patient_id, device_type, metric_type)
+                if key not in arrays:
+                    continue
+                times, values = arrays[key]
+                scored += len(values)
+                # Episodes wholly before the new rows were handled by earlier passes
+                first_new_epoch = first_new.timestamp()
+                found.extend(
+                    (key, episode)
+                    for episode in detect_episodes(times, values, RULES[metric_type])
+                    if episode.end >= first_new_epoch
+                )
+            scoring_seconds += time.perf_counter() - scoring_started
+
+        if found:
+            await _upsert_observations(db, found)
+        await db.execute(
+            pg_insert(JobWatermark)
+            .values(job_name=JOB_NAME, watermark=upper)
+            .on_conflict_do_update(
+                index_elements=[JobWatermark.job_name],
+                set_={"watermark": upper, "updated_at": func.now()}
+            )
+        )
+        await db.commit()
+
+    WEARABLE_ANOMALY_SAMPLES.inc(scored)
+    elapsed = time.perf_counter() - started
+    stats = {
+        "series": len(dirty),
+        "samples": scored,
+        "episodes": len(found),
+        "elapsed_seconds": round(elapsed, 3),
+        "samples_per_second": round(scored / elapsed, 1) if elapsed > 0 else None,
+        "scoring_samples_per_second": round(scored / scoring_seconds, 1) if scoring_seconds > 0 else None,
+    }
+    if dirty:
+        logger.info(f"wearable anomaly pass: {stats}")
+    return stats
+
+
+async def detection_loop():
+    """
+    Background task started from the app lifespan
+    """
+    while True:
+        try:
+            await run_detection()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"wearable anomaly detection failed: {e}")
+        await asyncio.sleep(settings.WEARABLE_ANOMALY_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def _main():
+        print(await run_detection())
+        await async_engine.dispose()
+
+    asyncio.run(_main())
@@ -0,0 +1,69 @@
+"""
+wearable_data storage maintenance
+
+On TimescaleDB, applies the WEARABLE_COMPRESS_AFTER_DAYS /
+WEARABLE_RAW_RETENTION_DAYS / WEARABLE_AGGREGATE_RETENTION_DAYS settings to
+the policies installed by 007_wearable_compression, once at startup. On
+plain PostgreSQL, which has no background jobs, it periodically creates
+upcoming monthly partitions, enforces retention and refreshes recent days of
+the daily rollup. One worker at a time (advisory lock); can be run by hand:
+
+    python -m app.jobs.wearable_policies
+"""
+from typing import Dict
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import async_engine
+from app.services.wearable_storage import detect_storage, get_storage
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant identifying this job's advisory lock
+_LOCK_KEY = 7_310_043
+
+
+async def run_maintenance() -> Dict:
+    """
+    Run one maintenance pass; returns what was applied or changed
+    """
+    storage = get_storage()
+    async with async_engine.begin() as conn:
+        locked = await conn.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        if not locked:
+            return {"skipped": True}
+        result = await storage.maintain(conn)
+
+    logger.info(f"wearable_data maintenance ({storage.name}): {result}")
+    return result
+
+
+async def maintenance_loop():
+    """
+    Background task started from the app lifespan
+    """
+    interval = settings.WEARABLE_MAINTENANCE_INTERVAL_HOURS * 3600
+    while True:
+        try:
+            await run_maintenance()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"wearable_data maintenance failed: {e}")
+        if not get_storage().periodic_maintenance:
+            return
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def _main():
+        await detect_storage()
+        print(await run_maintenance())
+        await async_engine.dispose()
+
+    asyncio.run(_main())
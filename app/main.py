@@ -3,21 +3,34 @@ Main FastAPI Application
 """
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
+from sqlalchemy import text
+import asyncio
 import logging
-import time
-from typing import Callable
 
 from app.core.config import settings
-from app.core.database import engine, Base
-from app.api import auth, patients, encounters, prescriptions, abdm, clinical
+from app.core.database import engine, async_engine, dispose_engines, Base
+from app.core.cache import invalidation_bus
+from app.core.live_vitals import vitals_broker
+from app.core.http import start_upstreams, close_upstreams
+from app.core.audit import audit_sink
+from app.core.metrics import render_metrics
+from app.core.middleware import RequestMetricsMiddleware, PreflightCacheMiddleware, RequestIdLogFilter
+from app.jobs.audit_partitions import maintenance_loop as audit_partition_maintenance
+from app.jobs.wearable_policies import maintenance_loop as wearable_storage_maintenance
+from app.jobs.wearable_anomalies import detection_loop as wearable_anomaly_detection
+from app.services.wearable_storage import detect_storage
+from app.services import drug_knowledge, interaction_cache
+from app.api import auth, patients, encounters, prescriptions, abdm, clinical, wearables, live
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
 )
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(RequestIdLogFilter())
 logger = logging.getLogger(__name__)
 
 
@@ -34,10 +47,47 @@ async def lifespan(app: FastAPI):
     # Create database tables (in production, use Alembic migrations)
     # Base.metadata.create_all(bind=engine)
     
+    # Cross-worker cache invalidation (principal cache, etc.)
+    await invalidation_bus.start()
+    
+    # Cross-worker live vitals fan-out for /ws/vitals
+    await vitals_broker.bus.start()
+    
+    # Drug master data; a bad file fails startup rather than the first prescription
+    drug_knowledge.reload()
+    
+    # Pooled HTTP client for HPR
+    await start_upstreams()
+    
+    # Batched audit-log writer
+    await audit_sink.start()
+    
+    # audit_logs partition creation / retention
+    background_jobs = [asyncio.create_task(audit_partition_maintenance())]
+    
+    # TimescaleDB or partitioned wearable_data, then its policies / partitions
+    await detect_storage()
+    background_jobs.append(asyncio.create_task(wearable_storage_maintenance()))
+    
+    # Tachycardia / low-HRV episodes -> FHIR Observations
+    if settings.WEARABLE_ANOMALY_ENABLED:
+        background_jobs.append(asyncio.create_task(wearable_anomaly_detection()))
+    
     yield
     
     # Shutdown
     logger.info("Shutting down IntegMed API...")
+    for job in background_jobs:
+        job.cancel()
+    # Let jobs unwind before the sink's final drain and before engines close
+    await asyncio.gather(*background_jobs, return_exceptions=True)
+    await audit_sink.stop()
+    logger.info(f"Audit sink drained: {audit_sink.stats()}")
+    await close_upstreams()
+    await interaction_cache.close()
+    await vitals_broker.bus.stop()
+    await invalidation_bus.stop()
+    await dispose_engines()
 
 
 # Create FastAPI app
@@ -51,31 +101,18 @@ app = FastAPI(
     openapi_url="/api/openapi.json"
 )
 
-# CORS Configuration
+# Middleware (last added runs first): metrics/timing -> preflight cache -> CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Process-Time"],
+    max_age=settings.CORS_PREFLIGHT_MAX_AGE,
 )
-
-
-# Request timing middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next: Callable):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    
-    # Log slow requests
-    if process_time > 1.0:
-        logger.warning(
-            f"Slow request: {request.method} {request.url.path} took {process_time:.2f}s"
-        )
-    
-    return response
+app.add_middleware(PreflightCacheMiddleware)
+app.add_middleware(RequestMetricsMiddleware, slow_request_seconds=settings.SLOW_REQUEST_SECONDS)
 
 
 # Error handlers
@@ -111,10 +148,8 @@ async def readiness_check():
     """
     try:
         # Test database connection
-        from app.core.database import SessionLocal
-        db = SessionLocal()
-        db.execute("SELECT 1")
-        db.close()
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
         
         return {
             "status": "ready",
@@ -132,6 +167,15 @@ async def readiness_check():
         )
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus scrape endpoint (aggregated across gunicorn workers)
+    """
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+
 # Include routers
 app.include_router(auth.router, prefix=f"/api/{settings.API_VERSION}/auth", tags=["Authentication"])
 app.include_router(patients.router, prefix=f"/api/{settings.API_VERSION}/patients", tags=["Patients"])
@@ -139,6 +183,8 @@ app.include_router(encounters.router, prefix=f"/api/{settings.API_VERSION}/encou
 app.include_router(prescriptions.router, prefix=f"/api/{settings.API_VERSION}/prescriptions", tags=["Prescriptions"])
 app.include_router(abdm.router, prefix=f"/api/{settings.API_VERSION}/abdm", tags=["ABDM"])
 app.include_router(clinical.router, prefix=f"/api/{settings.API_VERSION}/clinical", tags=["Clinical"])
+app.include_router(wearables.router, prefix=f"/api/{settings.API_VERSION}/wearables", tags=["Wearables"])
+app.include_router(live.router, prefix="/ws", tags=["Live"])
 
 
 @app.get("/", tags=["Root"])
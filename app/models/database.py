@@ -4,7 +4,7 @@ SQLAlchemy Database Models
 from datetime import datetime, date
 from typing import Optional, Dict, Any, List
 from uuid import UUID, uuid4
-from sqlalchemy import Column, String, Boolean, Integer, DateTime, Date, Text, ForeignKey, Numeric, func
+from sqlalchemy import Column, String, Boolean, Integer, BigInteger, DateTime, Date, Text, ForeignKey, Numeric, MetaData, Table, func, text
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB, INET
 from sqlalchemy.orm import relationship, declarative_base
 
@@ -56,6 +56,8 @@ class Patient(Base):
     address = Column(JSONB, nullable=True)
     emergency_contact = Column(JSONB, nullable=True)
     is_active = Column(Boolean, default=True)
+    # Bumped with every write to the patient's chart; see app.services.chart_cache
+    chart_version = Column(BigInteger, nullable=False, server_default=text("0"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -190,6 +192,84 @@ class FHIRResource(Base):
     encounter = relationship("Encounter", back_populates="fhir_resources")
 
 
+class WearableData(Base):
+    """
+    Wearable device samples (TimescaleDB hypertable or monthly partitions, see 003_wearable_data)
+    The table has no primary key; the mapper identifies rows by sample key
+    """
+    __tablename__ = "wearable_data"
+
+    time = Column(DateTime(timezone=True), nullable=False)
+    patient_id = Column(PG_UUID(as_uuid=True), ForeignKey("patients.id", ondelete="CASCADE"), nullable=False)
+    device_type = Column(String(50), nullable=False)  # 'fitbit', 'apple_watch', 'garmin'
+    metric_type = Column(String(50), nullable=False)  # 'heart_rate', 'hrv', 'sleep', 'steps'
+    value = Column(Numeric, nullable=True)
+    unit = Column(String(20), nullable=True)
+    metadata_ = Column("metadata", JSONB, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __mapper_args__ = {"primary_key": [patient_id, device_type, metric_type, time]}
+
+
+class WearableIngestBatch(Base):
+    """
+    Idempotency keys of bulk wearable uploads and their final reports
+    """
+    __tablename__ = "wearable_ingest_batches"
+
+    idempotency_key = Column(String(255), primary_key=True)
+    user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    status = Column(String(20), nullable=False)  # 'in_progress', 'completed'
+    report = Column(JSONB, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class JobWatermark(Base):
+    """
+    Progress of incremental background jobs (see app.jobs)
+    """
+    __tablename__ = "job_watermarks"
+
+    job_name = Column(String(100), primary_key=True)
+    watermark = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# Database views are kept out of Base.metadata so create_all never makes tables for them
+view_metadata = MetaData()
+
+# Daily rollup of wearable_data: a continuous aggregate on TimescaleDB, a
+# plain table on PostgreSQL (see 003_wearable_data)
+wearable_daily_avg = Table(
+    "wearable_daily_avg",
+    view_metadata,
+    Column("patient_id", PG_UUID(as_uuid=True)),
+    Column("device_type", String(50)),
+    Column("metric_type", String(50)),
+    Column("day", DateTime(timezone=True)),
+    Column("avg_value", Numeric),
+    Column("min_value", Numeric),
+    Column("max_value", Numeric),
+    Column("data_points", BigInteger),
+)
+
+
+class PatientSummary(Base):
+    """
+    Per-patient summary projection for timeline headers
+    Maintained incrementally by app.services.patient_summary on writes
+    """
+    __tablename__ = "patient_summary"
+
+    patient_id = Column(PG_UUID(as_uuid=True), ForeignKey("patients.id", ondelete="CASCADE"), primary_key=True)
+    last_visit = Column(DateTime(timezone=True), nullable=True)
+    chronic_conditions = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))  # code -> condition
+    allergies = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))  # code -> allergy
+    active_prescriptions = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))  # prescription id -> medications
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 class ABDMConsent(Base):
     """
     ABDM consent requests and artifacts
@@ -238,16 +318,18 @@ class ABDMDataRequest(Base):
 class AuditLog(Base):
     """
     Audit trail for compliance and security
+    Range-partitioned by month on created_at (see 004_partition_audit_logs)
     """
     __tablename__ = "audit_logs"
 
     id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid4)
     user_id = Column(PG_UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
-    action = Column(String(100), nullable=False, index=True)
+    action = Column(String(100), nullable=False)
     resource_type = Column(String(50), nullable=True)
     resource_id = Column(PG_UUID(as_uuid=True), nullable=True)
     ip_address = Column(INET, nullable=True)
     user_agent = Column(Text, nullable=True)
     request_data = Column(JSONB, nullable=True)
     response_status = Column(Integer, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Partition key, part of the primary key
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
@@ -350,6 +350,7 @@ class FHIRResourceResponse(FHIRResourceCreate):
 # =============== Health Timeline Schemas ===============
 
 class TimelineEvent(BaseModel):
+    id: Optional[UUID] = None
     date: datetime
     type: str  # 'wearable', 'allopathic', 'ayush', 'lab', 'consultation'
     category: str
@@ -361,6 +362,8 @@ class HealthTimelineResponse(BaseModel):
     patient_id: UUID
     timeline: List[TimelineEvent]
     summary: Dict[str, Any]
+    next_cursor: Optional[str] = None
+    wearables: Optional[Dict[str, Any]] = None
 
 
 # Update forward references
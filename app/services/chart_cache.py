@@ -0,0 +1,115 @@
+"""
+Per-patient versioned response cache for clinical reads
+
+Every patient row carries a chart_version counter. Any write touching the
+patient (encounter, prescription, FHIR resource, wearable ingest) increments
+it in the writing transaction, so all workers see the new version exactly
+when the write commits. ETags embed the version, which makes If-None-Match
+checks and cached response bytes valid exactly until the next write; a read
+costs one primary-key lookup on the primary instead of the chart queries.
+A miss is built on the replica only once it has caught up to that version.
+"""
+from typing import Iterable, Optional, Tuple
+from uuid import UUID
+import hashlib
+
+from fastapi import Request, Response
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import replica_engines
+from app.models.database import Encounter, FHIRResource, Patient, Prescription, WearableData
+
+_responses = TTLCache(settings.CHART_CACHE_MAX_ENTRIES, settings.CHART_CACHE_TTL_SECONDS)
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _bump_statement(patient_ids: Iterable):
+    return (
+        update(Patient.__table__)
+        .where(Patient.__table__.c.id.in_(list(patient_ids)))
+        .values(chart_version=Patient.__table__.c.chart_version + 1)
+    )
+
+
+async def bump_patient_versions(db: AsyncSession, patient_ids: Iterable):
+    """
+    Invalidate cached charts for these patients when the caller's
+    transaction commits (for writes that bypass the ORM, e.g. COPY)
+    """
+    patient_ids = set(patient_ids)
+    if patient_ids:
+        await db.execute(_bump_statement(patient_ids))
+
+
+def _etag(request: Request, version: int) -> str:
+    # The version is read before the handler queries, so a write racing the
+    # read leaves the stored bytes under an already-retired ETag
+    representation = f"{request.url.path}?{sorted(request.query_params.multi_items())}"
+    digest = hashlib.sha1(representation.encode()).hexdigest()[:12]
+    return f'"{version}-{digest}"'
+
+
+def _headers(etag: str, cache_status: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "X-Cache": cache_status}
+
+
+async def lookup(request: Request, db: AsyncSession, patient_id: UUID) -> Tuple[Optional[str], Optional[Response]]:
+    """
+    ETag for this read, plus a ready response when it can be answered
+    without the chart queries (304, or cached bytes). No ETag for an
+    unknown patient: the handler answers that uncached.
+    """
+    version_query = select(Patient.chart_version).where(Patient.id == patient_id)
+    # From the primary: a write committed on any worker retires the old ETag at once
+    version = await db.scalar(version_query, bind_arguments={"primary": True})
+    if version is None:
+        return None, None
+    etag = _etag(request, version)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return etag, Response(status_code=304, headers=_headers(etag, "revalidated"))
+
+    body = _responses.get(etag)
+    if body is not None:
+        return etag, Response(content=body, media_type=JSON_MEDIA_TYPE, headers=_headers(etag, "hit"))
+
+    if db.info.get("read_only") and replica_engines:
+        # A replica that has not applied this version yet would store stale
+        # bytes under the new ETag: build this chart on the primary instead
+        if await db.scalar(version_query) != version:
+            db.info["read_only"] = False
+    return etag, None
+
+
+def store(etag: Optional[str], body: bytes) -> Response:
+    """
+    Cache serialized bytes under the ETag and return them
+    """
+    if etag is None:
+        return Response(content=body, media_type=JSON_MEDIA_TYPE)
+    _responses.set(etag, body)
+    return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=_headers(etag, "miss"))
+
+
+# =============== Version bumps on write ===============
+
+_PATIENT_SCOPED = (Encounter, Prescription, FHIRResource, WearableData)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_touched_patients(session, flush_context):
+    touched = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Patient):
+            touched.add(obj.id)
+        elif isinstance(obj, _PATIENT_SCOPED) and obj.patient_id is not None:
+            touched.add(obj.patient_id)
+    if touched:
+        # Core UPDATE on the flush's connection: part of the same transaction
+        session.connection().execute(_bump_statement(touched))
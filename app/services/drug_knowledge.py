@@ -0,0 +1,209 @@
+"""
+Drug knowledge base
+
+Loaded once from the drug master file (DRUG_MASTER_PATH, JSON) into frozen,
+indexed structures. Readers take one snapshot per request with
+get_knowledge_base() and only ever do lookups on it. reload() builds a
+complete new snapshot before swapping the module reference, so a request
+never sees a half-loaded base; the `version` content hash identifies the
+snapshot (cache keys, responses).
+
+Interaction rules are written against interaction terms: ingredient IDs
+(a drug's ingredients default to its generic name) or pharmacological
+classes, spelled "class:<NAME>". Alongside the rule tables each snapshot
+keeps adjacency sets (term -> terms it interacts with) so a regimen is
+checked by set intersection; see app.services.interaction_index.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, Optional, Set, Tuple
+import hashlib
+import json
+import logging
+import threading
+
+from app.core.cache import invalidation_bus
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Drug:
+    generic_name: str
+    abbreviations: Tuple[str, ...]
+    forms: Tuple[str, ...]
+    strengths: Tuple[str, ...]
+    rxnorm: Optional[str]
+    snomed: Optional[str]
+    schedule: Optional[str]  # Drugs and Cosmetics Rules schedule ('H', 'H1', 'X') or 'OTC'
+    terms: Tuple[str, ...]  # ingredient IDs, then "class:<NAME>" terms
+
+
+@dataclass(frozen=True)
+class Frequency:
+    code: str
+    text: str
+    per_day: int
+
+
+@dataclass(frozen=True)
+class InteractionRule:
+    severity: str
+    description: str
+    recommendation: str
+    references: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class DrugKnowledgeBase:
+    version: str
+    drugs: Mapping[str, Drug]  # generic name -> drug
+    abbreviations: Mapping[str, Drug]  # lower-case abbreviation -> drug
+    frequencies: Mapping[str, Frequency]  # lower-case code -> frequency
+    drug_interactions: Mapping[Tuple[str, str], InteractionRule]  # sorted term pair
+    herb_drug_interactions: Mapping[Tuple[str, str], InteractionRule]  # (herb, term)
+    contraindications: Mapping[Tuple[str, str], str]  # (term, condition) -> message
+    interacts_with: Mapping[str, FrozenSet[str]]  # term -> terms
+    herb_interacts_with: Mapping[str, FrozenSet[str]]  # herb -> terms
+    contraindicated_in: Mapping[str, FrozenSet[str]]  # term -> conditions
+
+    def terms_for(self, generic_name: str) -> Tuple[str, ...]:
+        """
+        Interaction terms of a medication; unknown drugs are their own ingredient
+        """
+        drug = self.drugs.get(generic_name)
+        return drug.terms if drug is not None else (generic_name,)
+
+
+def _rule(entry: Dict[str, Any]) -> InteractionRule:
+    return InteractionRule(
+        severity=entry["severity"],
+        description=entry["description"],
+        recommendation=entry["recommendation"],
+        references=tuple(entry.get("references") or ())
+    )
+
+
+def _frozen(adjacency: Dict[str, Set[str]]) -> Mapping[str, FrozenSet[str]]:
+    return MappingProxyType({key: frozenset(values) for key, values in adjacency.items()})
+
+
+def parse_knowledge_base(raw: bytes) -> DrugKnowledgeBase:
+    """
+    Build an immutable knowledge base from drug master JSON; raises
+    ValueError/KeyError on malformed input
+    """
+    data = json.loads(raw)
+
+    drugs: Dict[str, Drug] = {}
+    abbreviations: Dict[str, Drug] = {}
+    for entry in data["drugs"]:
+        drug = Drug(
+            generic_name=entry["generic_name"],
+            abbreviations=tuple(entry.get("abbreviations") or ()),
+            forms=tuple(entry.get("forms") or ()),
+            strengths=tuple(entry.get("strengths") or ()),
+            rxnorm=entry.get("rxnorm"),
+            snomed=entry.get("snomed"),
+            schedule=entry.get("schedule"),
+            terms=tuple(entry.get("ingredients") or (entry["generic_name"],))
+            + tuple(f"class:{name}" for name in entry.get("classes") or ())
+        )
+        drugs[drug.generic_name] = drug
+        for abbreviation in drug.abbreviations:
+            if abbreviation.lower() in abbreviations:
+                raise ValueError(f"Duplicate abbreviation {abbreviation!r}")
+            abbreviations[abbreviation.lower()] = drug
+
+    frequencies = {
+        entry["code"].lower(): Frequency(entry["code"].lower(), entry["text"], int(entry["per_day"]))
+        for entry in data.get("frequencies", [])
+    }
+    drug_interactions = {
+        tuple(sorted(entry["drugs"])): _rule(entry)
+        for entry in data.get("drug_interactions", [])
+    }
+    herb_drug_interactions = {
+        (entry["herb"], entry["drug"]): _rule(entry)
+        for entry in data.get("herb_drug_interactions", [])
+    }
+    contraindications = {
+        (entry["drug"], entry["condition"]): entry["message"]
+        for entry in data.get("contraindications", [])
+    }
+
+    interacts_with: Dict[str, Set[str]] = {}
+    for first, second in drug_interactions:
+        interacts_with.setdefault(first, set()).add(second)
+        interacts_with.setdefault(second, set()).add(first)
+    herb_interacts_with: Dict[str, Set[str]] = {}
+    for herb, term in herb_drug_interactions:
+        herb_interacts_with.setdefault(herb, set()).add(term)
+    contraindicated_in: Dict[str, Set[str]] = {}
+    for term, condition in contraindications:
+        contraindicated_in.setdefault(term, set()).add(condition)
+
+    return DrugKnowledgeBase(
+        version=hashlib.sha256(raw).hexdigest()[:16],
+        drugs=MappingProxyType(drugs),
+        abbreviations=MappingProxyType(abbreviations),
+        frequencies=MappingProxyType(frequencies),
+        drug_interactions=MappingProxyType(drug_interactions),
+        herb_drug_interactions=MappingProxyType(herb_drug_interactions),
+        contraindications=MappingProxyType(contraindications),
+        interacts_with=_frozen(interacts_with),
+        herb_interacts_with=_frozen(herb_interacts_with),
+        contraindicated_in=_frozen(contraindicated_in)
+    )
+
+
+def _master_path() -> Path:
+    path = Path(settings.DRUG_MASTER_PATH)
+    # Relative paths are relative to the app package, where the bundled file lives
+    return path if path.is_absolute() else Path(__file__).resolve().parent.parent / path
+
+
+_knowledge_base: Optional[DrugKnowledgeBase] = None
+_reload_lock = threading.Lock()
+
+
+def reload() -> DrugKnowledgeBase:
+    """
+    Load the drug master file and atomically replace the current snapshot.
+    On a bad file the previous snapshot stays in place and the error is raised.
+    """
+    global _knowledge_base
+    with _reload_lock:
+        knowledge_base = parse_knowledge_base(_master_path().read_bytes())
+        previous, _knowledge_base = _knowledge_base, knowledge_base
+    if previous is None or previous.version != knowledge_base.version:
+        logger.info(f"Drug knowledge base {knowledge_base.version} loaded: {len(knowledge_base.drugs)} drugs")
+    return knowledge_base
+
+
+def get_knowledge_base() -> DrugKnowledgeBase:
+    """
+    Current snapshot; take it once and use it for the whole request
+    """
+    knowledge_base = _knowledge_base
+    return knowledge_base if knowledge_base is not None else reload()
+
+
+def request_reload():
+    """
+    Reload in this and every other worker
+    """
+    invalidation_bus.publish("drug_knowledge", "reload")
+
+
+def _reload_from_bus(_key: str):
+    try:
+        reload()
+    except Exception as e:
+        current = _knowledge_base.version if _knowledge_base is not None else None
+        logger.error(f"Drug knowledge base reload failed, keeping {current}: {e}")
+
+
+invalidation_bus.subscribe("drug_knowledge", _reload_from_bus)
@@ -0,0 +1,77 @@
+"""
+Sparse fieldsets (`fields=` / `expand=`) for read endpoints
+
+`fields` narrows the response to the listed attributes; `expand` opts into
+heavy attributes (large JSONB/text) that are left out by default. For ORM
+reads the selection becomes a load_only() option, so unselected columns are
+never fetched.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import load_only
+
+
+@dataclass(frozen=True)
+class Fieldset:
+    fields: Optional[FrozenSet[str]]  # None: every default attribute
+    expand: FrozenSet[str]
+
+    def includes(self, name: str) -> bool:
+        return self.fields is None or name in self.fields
+
+    def expands(self, name: str) -> bool:
+        return name in self.expand or (self.fields is not None and name in self.fields)
+
+
+def _split(value: Optional[str]) -> FrozenSet[str]:
+    return frozenset(part.strip() for part in (value or "").split(",") if part.strip())
+
+
+def parse_fieldset(
+    fields: Optional[str],
+    expand: Optional[str],
+    allowed: Iterable[str],
+    expandable: Iterable[str]
+) -> Fieldset:
+    """
+    Validate comma-separated `fields` / `expand` values; raises ValueError
+    """
+    allowed, expandable = frozenset(allowed), frozenset(expandable)
+    requested_fields = _split(fields)
+    requested_expand = _split(expand)
+
+    unknown = requested_fields - allowed - expandable
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    unknown = requested_expand - expandable
+    if unknown:
+        raise ValueError(f"Cannot expand: {', '.join(sorted(unknown))}")
+
+    return Fieldset(requested_fields or None, requested_expand)
+
+
+@dataclass(frozen=True)
+class ModelFieldset:
+    """
+    Selectable columns of one ORM model: `default` columns are returned
+    unless `fields` narrows them, `heavy` ones only when expanded
+    """
+    model: Any
+    default: FrozenSet[str]
+    heavy: FrozenSet[str]
+    required: FrozenSet[str] = frozenset({"id"})
+
+    def parse(self, fields: Optional[str], expand: Optional[str]) -> Fieldset:
+        return parse_fieldset(fields, expand, self.default, self.heavy)
+
+    def columns(self, fieldset: Fieldset) -> FrozenSet[str]:
+        selected = self.default if fieldset.fields is None else fieldset.fields
+        return selected | {name for name in self.heavy if fieldset.expands(name)} | self.required
+
+    def load_options(self, fieldset: Fieldset):
+        return load_only(*[getattr(self.model, name) for name in sorted(self.columns(fieldset))])
+
+    def payload(self, obj, fieldset: Fieldset) -> Dict[str, Any]:
+        return jsonable_encoder({name: getattr(obj, name) for name in sorted(self.columns(fieldset))})
@@ -0,0 +1,152 @@
+"""
+Memoized interaction-check findings
+
+The prescription UI re-checks the whole regimen on every edit. Findings are
+cached under a canonical hash of the regimen (sorted generic names, AYUSH
+names, conditions and allergies) and the drug knowledge base version, in an
+in-process LRU and, with INTERACTION_CACHE_REDIS_ENABLED, a Redis tier
+shared by all workers. A knowledge base reload changes the version, so old
+entries are never read again; the local tier is also cleared then.
+
+Entries are name-level RegimenFindings, expanded against each request, so
+a hit returns exactly what a fresh check of that request would, in the
+request's own order.
+"""
+from collections import Counter
+from dataclasses import asdict
+from typing import Sequence
+import hashlib
+import json
+import logging
+import time
+
+from app.core.cache import TTLCache, invalidation_bus
+from app.core.config import settings
+from app.core.metrics import INTERACTION_CACHE_REQUESTS
+from app.services.drug_knowledge import DrugKnowledgeBase, InteractionRule
+from app.services.interaction_index import RegimenFindings, regimen_findings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "integmed:interactions:"
+
+# Back off from an unreachable shared tier instead of waiting on it per request
+SHARED_RETRY_SECONDS = 30
+
+_local = TTLCache(settings.INTERACTION_CACHE_MAX_ENTRIES, settings.INTERACTION_CACHE_TTL_SECONDS)
+_redis = None
+_shared_down_until = 0.0
+
+invalidation_bus.subscribe("drug_knowledge", lambda _key: _local.clear())
+
+
+def regimen_key(
+    kb: DrugKnowledgeBase,
+    generic_names: Sequence[str],
+    herbs: Sequence[str],
+    conditions: Sequence[str],
+    allergies: Sequence[str]
+) -> str:
+    """
+    Order-insensitive hash of everything the findings depend on. A drug
+    listed twice can interact with itself, so names keep up to two copies;
+    allergies are matched case-insensitively.
+    """
+    counts = Counter(generic_names)
+    canonical = [
+        kb.version,
+        sorted(name for name, count in counts.items() for _ in range(min(count, 2))),
+        sorted(set(herbs)),
+        sorted(set(conditions)),
+        sorted({allergy.lower() for allergy in allergies}),
+    ]
+    return hashlib.sha256(json.dumps(canonical).encode()).hexdigest()
+
+
+def _dumps(findings: RegimenFindings) -> str:
+    return json.dumps({
+        "drug_drug": [[*pair, asdict(rule)] for pair, rule in findings.drug_drug.items()],
+        "herb_drug": [[*pair, asdict(rule)] for pair, rule in findings.herb_drug.items()],
+        "contraindicated": [[*pair, message] for pair, message in findings.contraindicated.items()],
+        "allergic": sorted(findings.allergic),
+    })
+
+
+def _rule(data: dict) -> InteractionRule:
+    return InteractionRule(**dict(data, references=tuple(data["references"])))
+
+
+def _loads(raw) -> RegimenFindings:
+    data = json.loads(raw)
+    return RegimenFindings(
+        drug_drug={(first, second): _rule(rule) for first, second, rule in data["drug_drug"]},
+        herb_drug={(herb, name): _rule(rule) for herb, name, rule in data["herb_drug"]},
+        contraindicated={(name, condition): message for name, condition, message in data["contraindicated"]},
+        allergic=frozenset(data["allergic"])
+    )
+
+
+def _shared():
+    global _redis
+    if not settings.INTERACTION_CACHE_REDIS_ENABLED or time.monotonic() < _shared_down_until:
+        return None
+    if _redis is None:
+        import redis.asyncio as aioredis
+        _redis = aioredis.Redis.from_url(settings.REDIS_URL)
+    return _redis
+
+
+def _shared_failed(e: Exception):
+    global _shared_down_until
+    _shared_down_until = time.monotonic() + SHARED_RETRY_SECONDS
+    logger.warning(f"Interaction cache shared tier unavailable: {e}")
+
+
+async def get_findings(
+    kb: DrugKnowledgeBase,
+    generic_names: Sequence[str],
+    herbs: Sequence[str],
+    conditions: Sequence[str],
+    allergies: Sequence[str]
+) -> RegimenFindings:
+    """
+    Findings for this regimen from the local tier, the shared tier or a
+    fresh check, in that order
+    """
+    key = regimen_key(kb, generic_names, herbs, conditions, allergies)
+
+    findings = _local.get(key)
+    if findings is not None:
+        INTERACTION_CACHE_REQUESTS.labels(outcome="local_hit").inc()
+        return findings
+
+    shared = _shared()
+    if shared is not None:
+        try:
+            raw = await shared.get(KEY_PREFIX + key)
+        except Exception as e:
+            _shared_failed(e)
+            raw = None
+        if raw is not None:
+            findings = _loads(raw)
+            _local.set(key, findings)
+            INTERACTION_CACHE_REQUESTS.labels(outcome="shared_hit").inc()
+            return findings
+
+    findings = regimen_findings(kb, generic_names, herbs, conditions, allergies)
+    _local.set(key, findings)
+    INTERACTION_CACHE_REQUESTS.labels(outcome="miss").inc()
+
+    if shared is not None and time.monotonic() >= _shared_down_until:
+        try:
+            await shared.set(KEY_PREFIX + key, _dumps(findings), ex=settings.INTERACTION_CACHE_TTL_SECONDS)
+        except Exception as e:
+            _shared_failed(e)
+    return findings
+
+
+async def close():
+    global _redis
+    if _redis is not None:
+        await _redis.close()
+        _redis = None
@@ -0,0 +1,201 @@
+"""
+Interaction checks by set intersection
+
+A regimen is indexed once as term -> positions of the medications carrying
+it. Each medication's terms are then intersected with the knowledge base
+adjacency sets, so the work grows with the medications and the matches
+rather than with every pair times the size of the rule tables. Matches come
+back as positions in the request lists, in the order the pairwise loops
+produced them (i < j, herb then drug, medication then condition); where a
+pair matches through several terms the first term in declared order wins
+(for two drugs, walking the terms of the one whose terms sort first, so the
+rule does not depend on which of them was listed first).
+
+RegimenFindings holds the same matches by name rather than position, which
+is what app.services.interaction_cache memoizes; expanding them against a
+request reproduces exactly what the direct checks return for it.
+"""
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Mapping, Sequence, Set, Tuple
+
+from app.services.drug_knowledge import DrugKnowledgeBase, InteractionRule
+
+_NONE: frozenset = frozenset()
+
+
+def _holders(kb: DrugKnowledgeBase, generic_names: Sequence[str]) -> Tuple[List[Tuple[str, ...]], Dict[str, List[int]]]:
+    terms = [kb.terms_for(name) for name in generic_names]
+    holders: Dict[str, List[int]] = {}
+    for position, medication_terms in enumerate(terms):
+        for term in medication_terms:
+            holders.setdefault(term, []).append(position)
+    return terms, holders
+
+
+def drug_interactions(kb: DrugKnowledgeBase, generic_names: Sequence[str]) -> List[Tuple[int, int, InteractionRule]]:
+    """
+    (i, j, rule) for every interacting medication pair, i < j
+    """
+    terms, holders = _holders(kb, generic_names)
+    present = {term for term in holders if term in kb.interacts_with}
+    pairs: Set[Tuple[int, int]] = set()
+    for term in present:
+        for other in kb.interacts_with[term] & present:
+            for i in holders[term]:
+                pairs.update((i, j) for j in holders[other] if j > i)
+
+    found = []
+    for i, j in sorted(pairs):
+        outer, inner = sorted((terms[i], terms[j]))
+        rule = next(
+            kb.drug_interactions[key]
+            for key in (tuple(sorted((first, second))) for first in outer for second in inner)
+            if key in kb.drug_interactions
+        )
+        found.append((i, j, rule))
+    return found
+
+
+def herb_drug_interactions(
+    kb: DrugKnowledgeBase,
+    herbs: Sequence[str],
+    generic_names: Sequence[str]
+) -> List[Tuple[int, int, InteractionRule]]:
+    """
+    (herb position, medication position, rule) for every interacting pair
+    """
+    terms, holders = _holders(kb, generic_names)
+    present = frozenset(holders)
+    pairs: Set[Tuple[int, int]] = set()
+    for h, herb in enumerate(herbs):
+        for term in kb.herb_interacts_with.get(herb, _NONE) & present:
+            pairs.update((h, m) for m in holders[term])
+
+    found = []
+    for h, m in sorted(pairs):
+        rule = next(
+            kb.herb_drug_interactions[(herbs[h], term)]
+            for term in terms[m]
+            if (herbs[h], term) in kb.herb_drug_interactions
+        )
+        found.append((h, m, rule))
+    return found
+
+
+def contraindications(
+    kb: DrugKnowledgeBase,
+    generic_names: Sequence[str],
+    conditions: Sequence[str]
+) -> List[Tuple[int, str, str]]:
+    """
+    (medication position, condition, message) for every contraindicated
+    pair; a condition listed twice is reported twice, as before
+    """
+    condition_set = frozenset(conditions)
+    found = []
+    for m, name in enumerate(generic_names):
+        medication_terms = kb.terms_for(name)
+        matched = set()
+        for term in medication_terms:
+            matched |= kb.contraindicated_in.get(term, _NONE) & condition_set
+        if not matched:
+            continue
+        for condition in conditions:
+            if condition in matched:
+                message = next(
+                    kb.contraindications[(term, condition)]
+                    for term in medication_terms
+                    if (term, condition) in kb.contraindications
+                )
+                found.append((m, condition, message))
+    return found
+
+
+def allergic(generic_names: Sequence[str], allergies: Sequence[str]) -> List[int]:
+    """
+    Positions of medications the patient is allergic to (case-insensitive)
+    """
+    allergy_set = {allergy.lower() for allergy in allergies}
+    return [m for m, name in enumerate(generic_names) if name.lower() in allergy_set]
+
+
+# =============== Name-level findings ===============
+
+def _positions(names: Sequence[str]) -> Dict[str, List[int]]:
+    positions: Dict[str, List[int]] = {}
+    for position, name in enumerate(names):
+        positions.setdefault(name, []).append(position)
+    return positions
+
+
+@dataclass(frozen=True)
+class RegimenFindings:
+    drug_drug: Mapping[Tuple[str, str], InteractionRule]  # sorted generic-name pair
+    herb_drug: Mapping[Tuple[str, str], InteractionRule]  # (herb, generic name)
+    contraindicated: Mapping[Tuple[str, str], str]  # (generic name, condition) -> message
+    allergic: FrozenSet[str]  # generic names
+
+    def drug_interactions(self, generic_names: Sequence[str]) -> List[Tuple[int, int, InteractionRule]]:
+        positions = _positions(generic_names)
+        found = []
+        for (first, second), rule in self.drug_drug.items():
+            if first == second:
+                held = positions.get(first, [])
+                found.extend((i, j, rule) for n, i in enumerate(held) for j in held[n + 1:])
+            else:
+                found.extend(
+                    (min(i, j), max(i, j), rule)
+                    for i in positions.get(first, []) for j in positions.get(second, [])
+                )
+        found.sort(key=lambda match: match[:2])
+        return found
+
+    def herb_drug_interactions(self, herbs: Sequence[str], generic_names: Sequence[str]) -> List[Tuple[int, int, InteractionRule]]:
+        herb_positions, positions = _positions(herbs), _positions(generic_names)
+        found = [
+            (h, m, rule)
+            for (herb, name), rule in self.herb_drug.items()
+            for h in herb_positions.get(herb, []) for m in positions.get(name, [])
+        ]
+        found.sort(key=lambda match: match[:2])
+        return found
+
+    def contraindications(self, generic_names: Sequence[str], conditions: Sequence[str]) -> List[Tuple[int, str, str]]:
+        flagged = {name for name, _ in self.contraindicated}
+        return [
+            (m, condition, self.contraindicated[(name, condition)])
+            for m, name in enumerate(generic_names) if name in flagged
+            for condition in conditions if (name, condition) in self.contraindicated
+        ]
+
+    def allergic_positions(self, generic_names: Sequence[str]) -> List[int]:
+        return [m for m, name in enumerate(generic_names) if name in self.allergic]
+
+
+def regimen_findings(
+    kb: DrugKnowledgeBase,
+    generic_names: Sequence[str],
+    herbs: Sequence[str],
+    conditions: Sequence[str],
+    allergies: Sequence[str]
+) -> RegimenFindings:
+    """
+    Every match in a regimen, by name; duplicates only matter for drug pairs
+    (a drug listed twice can interact with itself), so callers may dedupe
+    the rest
+    """
+    return RegimenFindings(
+        drug_drug={
+            tuple(sorted((generic_names[i], generic_names[j]))): rule
+            for i, j, rule in drug_interactions(kb, generic_names)
+        },
+        herb_drug={
+            (herbs[h], generic_names[m]): rule
+            for h, m, rule in herb_drug_interactions(kb, herbs, generic_names)
+        },
+        contraindicated={
+            (generic_names[m], condition): message
+            for m, condition, message in contraindications(kb, generic_names, conditions)
+        },
+        allergic=frozenset(generic_names[m] for m in allergic(generic_names, allergies))
+    )
@@ -0,0 +1,220 @@
+"""
+Incrementally maintained patient summary
+
+Write paths call the record_* functions inside their own transaction; each
+one is a single INSERT ... ON CONFLICT DO UPDATE that merges into or removes
+keys from the JSONB maps, so concurrent writers never read-modify-write the
+row. Corrections to an existing encounter are the exception: its old
+diagnoses and start time can't be taken back out of merged maps, so
+refresh_encounter_facts() recomputes them from the patient's encounters
+under a row lock. Reads are one primary-key lookup.
+"""
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import String, func, literal, select, update
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.database import Encounter, FHIRResource, PatientSummary, Prescription
+
+# Prescription statuses that count as current medication
+ACTIVE_PRESCRIPTION_STATUSES = ("signed", "dispensed")
+
+# ICD-10 categories treated as chronic when recorded as an encounter diagnosis
+CHRONIC_ICD10_PREFIXES = (
+    "E10", "E11", "E03", "E78",  # diabetes, hypothyroidism, dyslipidaemia
+    "I10", "I11", "I25", "I48", "I50",  # hypertension, IHD, AF, heart failure
+    "J44", "J45",  # COPD, asthma
+    "N18",  # chronic kidney disease
+    "M05", "M06", "M15", "M17",  # rheumatoid arthritis, osteoarthritis
+    "F32", "F33", "G40",  # depression, epilepsy
+)
+
+INACTIVE_CLINICAL_STATUSES = ("inactive", "resolved", "remission", "refuted", "entered-in-error")
+
+
+async def _upsert(db: AsyncSession, patient_id: UUID, **columns):
+    """
+    Apply column updates; each value is (value for a new row, SET expression
+    builder taking the EXCLUDED row)
+    """
+    stmt = insert(PatientSummary).values(
+        patient_id=patient_id,
+        **{name: initial for name, (initial, _) in columns.items()}
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PatientSummary.patient_id],
+        set_={
+            **{name: build(stmt.excluded) for name, (_, build) in columns.items()},
+            "updated_at": func.now()
+        }
+    )
+    await db.execute(stmt)
+
+
+def _merge(column_name: str, entries: Dict[str, Any]):
+    column = getattr(PatientSummary, column_name)
+    return entries, lambda excluded: column.op("||", return_type=JSONB)(getattr(excluded, column_name))
+
+
+def _remove(column_name: str, key: str):
+    column = getattr(PatientSummary, column_name)
+    return {}, lambda excluded: column.op("-", return_type=JSONB)(literal(key, String))
+
+
+def _coding(resource: Dict[str, Any], field: str) -> Dict[str, Any]:
+    codings = (resource.get(field) or {}).get("coding") or [{}]
+    return codings[0]
+
+
+def _is_chronic(diagnosis: Dict[str, Any]) -> bool:
+    code = (diagnosis.get("code") or "").upper()
+    return str(diagnosis.get("chronic", "")).lower() == "true" or code.startswith(CHRONIC_ICD10_PREFIXES)
+
+
+def _chronic_diagnoses(assessment: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    if not isinstance(assessment, dict):
+        return {}
+    diagnoses = [assessment.get("primary_diagnosis")] + list(assessment.get("secondary_diagnoses") or [])
+    return {
+        diagnosis["code"]: {
+            "code": diagnosis["code"],
+            "display": diagnosis.get("display") or diagnosis.get("description"),
+            "source": "encounter"
+        }
+        for diagnosis in diagnoses
+        if isinstance(diagnosis, dict) and diagnosis.get("code") and _is_chronic(diagnosis)
+    }
+
+
+async def record_encounter(db: AsyncSession, encounter: Encounter):
+    """
+    Track the latest visit and chronic diagnoses of a new encounter
+    """
+    chronic = _chronic_diagnoses((encounter.soap_note or {}).get("assessment"))
+
+    columns = {
+        "last_visit": (
+            encounter.start_time,
+            lambda excluded: func.greatest(PatientSummary.last_visit, excluded.last_visit)
+        )
+    }
+    if chronic:
+        columns["chronic_conditions"] = _merge("chronic_conditions", chronic)
+    await _upsert(db, encounter.patient_id, **columns)
+
+
+async def refresh_encounter_facts(db: AsyncSession, patient_id: UUID):
+    """
+    Recompute the last visit and encounter-derived chronic conditions from
+    all of the patient's encounters, after one of them was corrected.
+    Conditions from other sources (FHIR) are kept.
+    """
+    await db.execute(
+        insert(PatientSummary)
+        .values(patient_id=patient_id)
+        .on_conflict_do_nothing(index_elements=[PatientSummary.patient_id])
+    )
+    # Once the lock is held, encounters committed by concurrent writers are
+    # visible to the next statement; later writers merge on top of ours
+    current = await db.scalar(
+        select(PatientSummary.chronic_conditions)
+        .where(PatientSummary.patient_id == patient_id)
+        .with_for_update()
+    )
+    result = await db.execute(
+        select(Encounter.start_time, Encounter.soap_note["assessment"])
+        .where(Encounter.patient_id == patient_id)
+    )
+
+    last_visit = None
+    chronic: Dict[str, Dict[str, Any]] = {}
+    for start_time, assessment in result.tuples():
+        if start_time is not None and (last_visit is None or start_time > last_visit):
+            last_visit = start_time
+        chronic.update(_chronic_diagnoses(assessment))
+    chronic.update({
+        code: entry for code, entry in (current or {}).items()
+        if entry.get("source") != "encounter"
+    })
+
+    await db.execute(
+        update(PatientSummary)
+        .where(PatientSummary.patient_id == patient_id)
+        .values(last_visit=last_visit, chronic_conditions=chronic, updated_at=func.now())
+    )
+
+
+async def record_prescription(db: AsyncSession, prescription: Prescription):
+    """
+    Add a signed/dispensed prescription to current medication, or drop it
+    """
+    key = str(prescription.id)
+    if prescription.status not in ACTIVE_PRESCRIPTION_STATUSES:
+        await _upsert(db, prescription.patient_id, active_prescriptions=_remove("active_prescriptions", key))
+        return
+
+    medications = [med.get("generic_name") for med in prescription.medications or []]
+    medications += [med.get("name") for med in prescription.ayush_medications or []]
+    entry = {
+        key: {
+            "prescription_number": prescription.prescription_number,
+            "medications": [name for name in medications if name]
+        }
+    }
+    await _upsert(db, prescription.patient_id, active_prescriptions=_merge("active_prescriptions", entry))
+
+
+async def record_fhir_resource(db: AsyncSession, resource: FHIRResource):
+    """
+    Fold ingested FHIR Conditions and AllergyIntolerances into the summary
+    """
+    if resource.patient_id is None or resource.resource_type not in ("Condition", "AllergyIntolerance"):
+        return
+
+    body = resource.resource or {}
+    coding = _coding(body, "code")
+    code = resource.code or coding.get("code") or resource.resource_id
+    clinical_status = _coding(body, "clinicalStatus").get("code")
+    column_name = "chronic_conditions" if resource.resource_type == "Condition" else "allergies"
+
+    if clinical_status in INACTIVE_CLINICAL_STATUSES:
+        await _upsert(db, resource.patient_id, **{column_name: _remove(column_name, code)})
+        return
+
+    entry = {"code": code, "display": coding.get("display") or (body.get("code") or {}).get("text")}
+    if resource.resource_type == "Condition":
+        entry["source"] = resource.source or "fhir"
+    else:
+        entry["criticality"] = body.get("criticality")
+    await _upsert(db, resource.patient_id, **{column_name: _merge(column_name, {code: entry})})
+
+
+async def get_summary(db: AsyncSession, patient_id: UUID) -> Dict[str, Any]:
+    """
+    Timeline summary block from the projection (one primary-key lookup)
+    """
+    result = await db.execute(select(PatientSummary).where(PatientSummary.patient_id == patient_id))
+    summary: Optional[PatientSummary] = result.scalar_one_or_none()
+    if summary is None:
+        return {
+            "last_visit": None,
+            "chronic_conditions": [],
+            "current_medications": 0,
+            "active_medications": [],
+            "allergy_alerts": []
+        }
+
+    active_medications: List[str] = sorted({
+        name
+        for entry in summary.active_prescriptions.values()
+        for name in entry.get("medications", [])
+    })
+    return {
+        "last_visit": summary.last_visit.isoformat() if summary.last_visit else None,
+        "chronic_conditions": list(summary.chronic_conditions.values()),
+        "current_medications": len(summary.active_prescriptions),
+        "active_medications": active_medications,
+        "allergy_alerts": list(summary.allergies.values())
+    }
@@ -0,0 +1,303 @@
+"""
+Health timeline engine
+
+Builds one UNION ALL projection over encounters, FHIR resources and
+prescriptions so PostgreSQL does the filtering, ordering and limiting, and
+only the columns an event needs leave the database. Heavy JSONB (SOAP notes,
+AYUSH assessments, raw FHIR resources) is only built into `data` when asked
+for with expand=.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from uuid import UUID
+import base64
+import binascii
+import json
+
+from sqlalchemy import DateTime, String, and_, case, cast, func, literal, null, or_, select, tuple_, union_all
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.database import Encounter, FHIRResource, Prescription, User
+from app.services.fieldsets import Fieldset, parse_fieldset
+from app.services.patient_summary import get_summary
+
+
+TIMELINE_FIELDS = ("id", "date", "type", "category", "facility", "data")
+# Large JSONB kept out of `data` unless requested with expand=
+TIMELINE_EXPANDABLE = ("soap_note", "ayush_assessment", "resource")
+
+
+@dataclass(frozen=True)
+class TimelineFilter:
+    patient_id: UUID
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    include_ayush: bool = True
+    fieldset: Fieldset = Fieldset(None, frozenset())
+    event_id: Optional[UUID] = None
+
+
+def parse_timeline_fieldset(fields: Optional[str], expand: Optional[str]) -> Fieldset:
+    fieldset = parse_fieldset(fields, expand, TIMELINE_FIELDS, TIMELINE_EXPANDABLE)
+    if fieldset.fields is not None:
+        # Keyset cursors need (date, type, id)
+        fieldset = Fieldset(fieldset.fields | {"id", "date", "type"}, fieldset.expand)
+    return fieldset
+
+
+def _doctor_label(name_column):
+    return literal("Dr. ", String) + name_column
+
+
+def _event_data(flt: TimelineFilter, columns: Dict[str, Any], heavy: Dict[str, Any]):
+    if not flt.fieldset.includes("data"):
+        return cast(null(), JSONB)
+    args: List[Any] = []
+    for key, column in columns.items():
+        args += [key, column]
+    for key, column in heavy.items():
+        if flt.fieldset.expands(key):
+            args += [key, column]
+    return func.jsonb_build_object(*args, type_=JSONB)
+
+
+def _encounter_events(flt: TimelineFilter):
+    # JSONB columns may hold a JSON null rather than SQL NULL
+    has_ayush = func.jsonb_typeof(Encounter.ayush_assessment) == "object"
+    query = (
+        select(
+            Encounter.id.label("id"),
+            Encounter.start_time.label("date"),
+            case((has_ayush, "ayush"), else_="allopathic").label("type"),
+            literal("consultation", String).label("category"),
+            _doctor_label(User.name).label("facility"),
+            _event_data(
+                flt,
+                {
+                    "encounter_id": Encounter.id,
+                    "type": Encounter.encounter_type,
+                    "chief_complaint": Encounter.chief_complaint
+                },
+                {
+                    "soap_note": Encounter.soap_note,
+                    "ayush_assessment": Encounter.ayush_assessment
+                }
+            ).label("data")
+        )
+        .join(User, User.id == Encounter.doctor_id)
+        .where(Encounter.patient_id == flt.patient_id)
+    )
+    if flt.start_date is not None:
+        query = query.where(Encounter.start_time >= flt.start_date)
+    if flt.end_date is not None:
+        query = query.where(Encounter.start_time <= flt.end_date)
+    if flt.event_id is not None:
+        query = query.where(Encounter.id == flt.event_id)
+    if not flt.include_ayush:
+        query = query.where(func.coalesce(has_ayush, False).is_(False))
+    return query
+
+
+def _fhir_events(flt: TimelineFilter):
+    query = (
+        select(
+            FHIRResource.id.label("id"),
+            # Resources without an effective date sit on the timeline when they were received
+            func.coalesce(
+                cast(FHIRResource.effective_date, DateTime(timezone=True)),
+                FHIRResource.created_at
+            ).label("date"),
+            literal("allopathic", String).label("type"),
+            func.coalesce(FHIRResource.category, "observation").label("category"),
+            FHIRResource.source_system.label("facility"),
+            _event_data(
+                flt,
+                {
+                    "resource_type": FHIRResource.resource_type,
+                    "code": FHIRResource.code,
+                    "value_numeric": FHIRResource.value_numeric,
+                    "value_text": FHIRResource.value_text
+                },
+                {"resource": FHIRResource.resource}
+            ).label("data")
+        )
+        .where(FHIRResource.patient_id == flt.patient_id)
+    )
+    undated = FHIRResource.effective_date.is_(None)
+    if flt.start_date is not None:
+        query = query.where(or_(
+            FHIRResource.effective_date >= flt.start_date.date(),
+            and_(undated, FHIRResource.created_at >= flt.start_date)
+        ))
+    if flt.end_date is not None:
+        query = query.where(or_(
+            FHIRResource.effective_date <= flt.end_date.date(),
+            and_(undated, FHIRResource.created_at <= flt.end_date)
+        ))
+    if flt.event_id is not None:
+        query = query.where(FHIRResource.id == flt.event_id)
+    return query
+
+
+def _prescription_events(flt: TimelineFilter):
+    has_ayush = Prescription.ayush_medications.op("@>")(cast("[{}]", JSONB))
+    query = (
+        select(
+            Prescription.id.label("id"),
+            Prescription.created_at.label("date"),
+            case((has_ayush, "ayush"), else_="allopathic").label("type"),
+            literal("prescription", String).label("category"),
+            _doctor_label(User.name).label("facility"),
+            _event_data(
+                flt,
+                {
+                    "prescription_id": Prescription.id,
+                    "prescription_number": Prescription.prescription_number,
+                    "status": Prescription.status,
+                    "medications": Prescription.medications,
+                    "ayush_medications": Prescription.ayush_medications
+                },
+                {}
+            ).label("data")
+        )
+        .join(User, User.id == Prescription.doctor_id)
+        .where(Prescription.patient_id == flt.patient_id)
+    )
+    if flt.start_date is not None:
+        query = query.where(Prescription.created_at >= flt.start_date)
+    if flt.end_date is not None:
+        query = query.where(Prescription.created_at <= flt.end_date)
+    if flt.event_id is not None:
+        query = query.where(Prescription.id == flt.event_id)
+    if not flt.include_ayush:
+        query = query.where(func.coalesce(has_ayush, False).is_(False))
+    return query
+
+
+def _events(flt: TimelineFilter):
+    return union_all(
+        _encounter_events(flt),
+        _fhir_events(flt),
+        _prescription_events(flt)
+    ).subquery("events")
+
+
+def encode_cursor(row) -> str:
+    """
+    Opaque keyset cursor for the position just after `row`
+    """
+    raw = json.dumps([row.date.isoformat(), row.type, str(row.id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str, UUID]:
+    """
+    Inverse of encode_cursor; raises ValueError on malformed input
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date_value, event_type, event_id = json.loads(raw)
+        return datetime.fromisoformat(date_value), str(event_type), UUID(event_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError("Invalid timeline cursor") from e
+
+
+def timeline_query(flt: TimelineFilter, limit: Optional[int] = None, cursor: Optional[str] = None):
+    """
+    Newest-first timeline rows keyed on (date, type, id)
+    """
+    events = _events(flt)
+    columns = [column for column in events.c if flt.fieldset.includes(column.name)]
+    query = select(*columns).order_by(events.c.date.desc(), events.c.type.desc(), events.c.id.desc())
+
+    if cursor is not None:
+        after_date, after_type, after_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(events.c.date, events.c.type, events.c.id) < tuple_(
+                literal(after_date, DateTime(timezone=True)),
+                literal(after_type, String),
+                literal(after_id, events.c.id.type)
+            )
+        )
+
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def event_payload(row) -> Dict[str, Any]:
+    payload = dict(row._mapping)
+    payload["id"] = str(row.id)
+    payload["date"] = row.date.isoformat() if row.date is not None else None
+    return payload
+
+
+async def fetch_timeline(
+    db: AsyncSession,
+    flt: TimelineFilter,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    One page of the timeline; returns a JSON-ready payload
+    """
+    # Fetch one extra row to know whether another page exists
+    result = await db.execute(timeline_query(flt, limit + 1, cursor))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+
+    timeline: List[Dict[str, Any]] = [event_payload(row) for row in rows]
+
+    # The header summary comes from the patient_summary projection
+    summary: Dict[str, Any] = await get_summary(db, flt.patient_id) if cursor is None else {}
+
+    return {
+        "patient_id": str(flt.patient_id),
+        "timeline": timeline,
+        "summary": summary,
+        "next_cursor": next_cursor
+    }
+
+
+async def stream_timeline(
+    flt: TimelineFilter,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> AsyncIterator[bytes]:
+    """
+    NDJSON lines read from a server-side cursor, one event per line.
+
+    Opens its own session: request-scoped dependencies are closed before a
+    streaming body is sent. When `limit` cuts the stream short, a final
+    {"next_cursor": ...} line tells the client where to resume.
+    """
+    query = timeline_query(flt, limit, cursor)
+    async with AsyncSessionLocal(info={"read_only": True}) as db:
+        result = await db.stream(query.execution_options(yield_per=settings.TIMELINE_STREAM_BATCH_SIZE))
+        sent = 0
+        last_row = None
+        async for row in result:
+            yield json.dumps(event_payload(row)).encode() + b"\n"
+            sent += 1
+            last_row = row
+
+    if limit is not None and sent == limit and last_row is not None:
+        yield json.dumps({"next_cursor": encode_cursor(last_row)}).encode() + b"\n"
+
+
+async def fetch_event(db: AsyncSession, patient_id: UUID, event_id: UUID) -> Optional[Dict[str, Any]]:
+    """
+    One timeline event with every heavy field expanded
+    """
+    flt = TimelineFilter(patient_id, fieldset=Fieldset(None, frozenset(TIMELINE_EXPANDABLE)), event_id=event_id)
+    result = await db.execute(select(_events(flt)))
+    row = result.first()
+    return event_payload(row) if row is not None else None
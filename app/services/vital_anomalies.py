@@ -0,0 +1,171 @@
+"""
+Vital-sign anomaly detection over wearable series
+
+Each series (one patient, device and metric) is scored against a trailing
+time-window baseline: the mean and standard deviation of the samples in the
+previous WEARABLE_ANOMALY_BASELINE_MINUTES, computed for every sample at once
+from cumulative sums. An episode starts at a sample that is both a z-score
+outlier in the rule's direction and past the rule's clinical limit, and lasts
+while samples stay past the limit with no gap longer than
+WEARABLE_ANOMALY_MAX_GAP_SECONDS: a sustained episode soon dominates its own
+trailing baseline, so the z-score only decides the onset. Episodes become
+FHIR Observations (see app.jobs.wearable_anomalies).
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+from uuid import UUID
+
+import numpy as np
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class Rule:
+    kind: str
+    direction: int  # +1: flag highs, -1: flag lows
+    limit: float  # the value must also be past this, in `direction`
+    min_std: float  # floor for the baseline deviation so flat baselines do not explode z
+    loinc: Tuple[str, str]
+    unit: Tuple[str, str]  # (display, UCUM code)
+
+
+RULES: Dict[str, Rule] = {
+    "heart_rate": Rule("tachycardia", +1, 100.0, 2.0, ("8867-4", "Heart rate"), ("beats/minute", "/min")),
+    "hrv": Rule("low-hrv", -1, 20.0, 3.0, ("80404-7", "R-R interval.standard deviation (Heart rate variability)"), ("ms", "ms")),
+}
+
+
+@dataclass(frozen=True)
+class Episode:
+    start: float  # epoch seconds
+    end: float
+    samples: int
+    peak: float  # most extreme value in the rule's direction
+    peak_z: float
+
+
+def rolling_baseline(times: np.ndarray, values: np.ndarray, window_seconds: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Mean, standard deviation and sample count of the trailing window
+    [t - window, t) for every sample; `times` must be ascending
+    """
+    starts = np.searchsorted(times, times - window_seconds, side="left")
+    stops = np.arange(len(values))
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    squares = np.concatenate(([0.0], np.cumsum(values * values)))
+
+    counts = stops - starts
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (sums[stops] - sums[starts]) / counts
+        variance = (squares[stops] - squares[starts]) / counts - mean * mean
+    return mean, np.sqrt(np.maximum(variance, 0.0)), counts
+
+
+def zscores(times: np.ndarray, values: np.ndarray, rule: Rule) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Z-score of every sample against its baseline, and whether the baseline
+    had enough samples to be trusted
+    """
+    mean, std, counts = rolling_baseline(times, values, settings.WEARABLE_ANOMALY_BASELINE_MINUTES * 60)
+    with np.errstate(invalid="ignore"):
+        z = (values - mean) / np.maximum(std, rule.min_std)
+    return z, counts >= settings.WEARABLE_ANOMALY_MIN_BASELINE_SAMPLES
+
+
+def detect_episodes(times: np.ndarray, values: np.ndarray, rule: Rule) -> List[Episode]:
+    """
+    Episodes in one ascending series
+    """
+    if len(values) == 0:
+        return []
+    z, trusted = zscores(times, values, rule)
+    beyond = np.flatnonzero(rule.direction * (values - rule.limit) >= 0)
+    if beyond.size == 0:
+        return []
+    with np.errstate(invalid="ignore"):
+        onset = trusted[beyond] & (rule.direction * z[beyond] >= settings.WEARABLE_ANOMALY_Z_THRESHOLD)
+
+    # Runs of past-the-limit samples, split where they are further apart than the gap
+    breaks = np.flatnonzero(np.diff(times[beyond]) > settings.WEARABLE_ANOMALY_MAX_GAP_SECONDS) + 1
+    run_firsts = np.concatenate(([0], breaks))
+    run_lasts = np.concatenate((breaks - 1, [beyond.size - 1]))
+
+    # Each run holding an onset is an episode from its first onset to the run's end
+    positions = np.arange(beyond.size)
+    first_onsets = np.minimum.reduceat(np.where(onset, positions, beyond.size), run_firsts)
+    episodes = first_onsets < beyond.size
+    firsts, lasts = first_onsets[episodes], run_lasts[episodes]
+    if firsts.size == 0:
+        return []
+
+    start = times[beyond[firsts]]
+    end = times[beyond[lasts]]
+    samples = lasts - firsts + 1
+    # reduceat over [first, last + 1) pairs; the padding keeps last + 1 in range
+    bounds = np.column_stack((firsts, lasts + 1)).ravel()
+    peak = rule.direction * np.maximum.reduceat(np.append(rule.direction * values[beyond], 0.0), bounds)[::2]
+    scores = np.where(np.isfinite(z[beyond]), rule.direction * z[beyond], -np.inf)
+    peak_z = np.maximum.reduceat(np.append(scores, 0.0), bounds)[::2]
+
+    keep = end - start >= settings.WEARABLE_ANOMALY_MIN_EPISODE_SECONDS
+    return [
+        Episode(float(s), float(e), int(n), float(p), float(pz))
+        for s, e, n, p, pz in zip(start[keep], end[keep], samples[keep], peak[keep], peak_z[keep])
+    ]
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+def episode_resource_id(patient_id: UUID, device_type: str, metric_type: str, episode: Episode) -> str:
+    """
+    Stable per episode start, so re-scoring a growing episode updates its
+    Observation instead of adding another
+    """
+    return f"wearable-{RULES[metric_type].kind}-{patient_id}-{device_type}-{int(episode.start)}"
+
+
+def episode_observation(patient_id: UUID, device_type: str, metric_type: str, episode: Episode) -> Dict[str, Any]:
+    """
+    FHIR R4 Observation for one episode
+    """
+    rule = RULES[metric_type]
+    code, display = rule.loinc
+    unit, ucum = rule.unit
+    return {
+        "resourceType": "Observation",
+        "id": episode_resource_id(patient_id, device_type, metric_type, episode),
+        "status": "preliminary",
+        "category": [{
+            "coding": [{
+                "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+                "code": "vital-signs",
+                "display": "Vital Signs"
+            }]
+        }],
+        "code": {
+            "coding": [{"system": "http://loinc.org", "code": code, "display": display}],
+            "text": f"{rule.kind} episode ({device_type})"
+        },
+        "subject": {"reference": f"Patient/{patient_id}"},
+        "effectivePeriod": {"start": _iso(episode.start), "end": _iso(episode.end)},
+        "valueQuantity": {
+            "value": round(episode.peak, 2),
+            "unit": unit,
+            "system": "http://unitsofmeasure.org",
+            "code": ucum
+        },
+        "interpretation": [{
+            "coding": [{
+                "system": "http://terminology.hl7.org/CodeSystem/v3-ObservationInterpretation",
+                "code": "H" if rule.direction > 0 else "L"
+            }]
+        }],
+        "device": {"display": device_type},
+        "note": [{
+            "text": f"{episode.samples} samples over {int(episode.end - episode.start)} s, peak z-score {episode.peak_z:.1f}"
+        }]
+    }
@@ -0,0 +1,423 @@
+"""
+Bulk wearable ingestion
+
+Request bodies (NDJSON or CSV) are decoded line by line as they arrive,
+validated row by row, and loaded with PostgreSQL COPY in chunks of
+WEARABLE_INGEST_CHUNK_ROWS. At most one chunk of rows is held in memory,
+whatever the size of the upload.
+
+Each chunk is COPYed into a temp staging table and moved into wearable_data
+with ON CONFLICT DO NOTHING on the sample key, so re-sent samples are counted
+once. Day buckets of wearable_daily_avg that gained rows and that the
+storage backend will not refresh on its own are refreshed explicitly.
+Uploads carrying an Idempotency-Key are recorded in wearable_ingest_batches;
+a retried completed batch returns the stored report without being read.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+import codecs
+import csv
+import json
+import time
+
+from sqlalchemy import delete, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import WEARABLE_INGEST_ROWS
+from app.models.database import Patient, WearableIngestBatch
+from app.services.chart_cache import bump_patient_versions
+from app.services.wearable_storage import get_storage
+
+COPY_COLUMNS = ("time", "patient_id", "device_type", "metric_type", "value", "unit", "metadata")
+
+# A single sample line never legitimately gets near this
+MAX_LINE_LENGTH = 64 * 1024
+
+STAGE_TABLE = "wearable_data_stage"
+
+# Rows are kept per connection and emptied at commit, so the table is
+# created once per pooled connection and reused by every later chunk
+CREATE_STAGE_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE}
+    (LIKE wearable_data INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+"""
+
+# Day buckets match time_bucket('1 day', time) in wearable_daily_avg
+MOVE_STAGED_SQL = f"""
+    WITH inserted AS (
+        INSERT INTO wearable_data ({", ".join(COPY_COLUMNS)})
+        SELECT {", ".join(COPY_COLUMNS)} FROM {STAGE_TABLE}
+        ON CONFLICT (patient_id, device_type, metric_type, time) DO NOTHING
+        RETURNING time
+    )
+    SELECT date_trunc('day', time, 'UTC') AS day, count(*) AS inserted
+    FROM inserted
+    GROUP BY 1
+"""
+
+
+class IngestError(ValueError):
+    """
+    The upload as a whole cannot be processed (bad format, oversized line)
+    """
+
+
+class RowError(ValueError):
+    pass
+
+
+class BatchConflict(Exception):
+    """
+    The idempotency key is in use by a running batch or another user
+    """
+
+
+@dataclass
+class IngestReport:
+    accepted: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    chunks: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    aborted: Optional[str] = None
+    patient_ids: Set[UUID] = field(default_factory=set)
+    refresh_days: Set[datetime] = field(default_factory=set)
+    # patient id -> {"device_type:metric_type": newest recent sample}, for live vitals
+    latest: Dict[UUID, Dict[str, Dict[str, Any]]] = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+
+    def reject(self, line: int, reason: str):
+        self.rejected += 1
+        if len(self.errors) < settings.WEARABLE_INGEST_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": reason})
+
+    def track_latest(self, records: List[tuple]):
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.LIVE_VITALS_MAX_SAMPLE_AGE_SECONDS)
+        for sample_time, patient_id, device_type, metric_type, value, unit, _ in records:
+            if value is None or sample_time < cutoff:
+                continue
+            epoch_ms = int(sample_time.timestamp() * 1000)
+            series = self.latest.setdefault(patient_id, {})
+            key = f"{device_type}:{metric_type}"
+            if key not in series or series[key]["time"] < epoch_ms:
+                series[key] = {
+                    "device_type": device_type,
+                    "metric_type": metric_type,
+                    "time": epoch_ms,
+                    "value": float(value),
+                    "unit": unit
+                }
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "chunks": self.chunks,
+            "refreshed_days": len(self.refresh_days),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.accepted / elapsed, 1) if elapsed > 0 else None,
+            "aborted": self.aborted,
+            "errors": self.errors
+        }
+
+
+# =============== Parsing ===============
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Split a byte stream into text lines without buffering the whole body
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        if len(buffer) > MAX_LINE_LENGTH:
+            raise IngestError(f"Line longer than {MAX_LINE_LENGTH} bytes")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        yield buffer.rstrip("\r")
+
+
+async def iter_rows(lines: AsyncIterator[str], media_type: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    (line number, raw row) pairs; a raw row is a dict, or the line's parse
+    error as a string
+    """
+    header: Optional[List[str]] = None
+    number = 0
+    async for line in lines:
+        number += 1
+        if not line.strip():
+            continue
+
+        if media_type == "text/csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip().lower() for name in values]
+                continue
+            if len(values) != len(header):
+                yield number, f"Expected {len(header)} columns, got {len(values)}"
+                continue
+            yield number, dict(zip(header, values))
+        else:
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, f"Invalid JSON: {e}"
+                continue
+            yield number, row if isinstance(row, dict) else "Expected a JSON object"
+
+
+def _parse_time(value: Any) -> datetime:
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace(".", "", 1).isdigit()):
+        epoch = float(value)
+        # Device SDKs disagree on seconds vs milliseconds
+        if epoch > 1e11:
+            epoch /= 1000
+        try:
+            return datetime.fromtimestamp(epoch, tz=timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise RowError(f"Epoch time out of range: {value!r}")
+    if not isinstance(value, str):
+        raise RowError("time must be an ISO 8601 string or epoch number")
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise RowError(f"Invalid time: {value!r}")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _required_text(row: Dict[str, Any], name: str, max_length: int) -> str:
+    value = row.get(name)
+    if value is None or not str(value).strip():
+        raise RowError(f"{name} is required")
+    value = str(value).strip()
+    if len(value) > max_length:
+        raise RowError(f"{name} longer than {max_length} characters")
+    return value
+
+
+def parse_row(row: Dict[str, Any], default_patient_id: Optional[UUID]) -> tuple:
+    """
+    Validate one raw row into a COPY record (ordered as COPY_COLUMNS)
+    """
+    if row.get("time") in (None, ""):
+        raise RowError("time is required")
+    sample_time = _parse_time(row["time"])
+    now = datetime.now(timezone.utc)
+    if sample_time > now + timedelta(seconds=settings.WEARABLE_INGEST_MAX_FUTURE_SECONDS):
+        raise RowError("time is in the future")
+    # Raw chunks this old have been dropped; refreshing their daily bucket
+    # from a lone late sample would overwrite the retained aggregate
+    if sample_time < now - timedelta(days=settings.WEARABLE_RAW_RETENTION_DAYS):
+        raise RowError("time is older than the raw data retention window")
+
+    patient_id = row.get("patient_id") or default_patient_id
+    if patient_id is None:
+        raise RowError("patient_id is required")
+    try:
+        patient_id = patient_id if isinstance(patient_id, UUID) else UUID(str(patient_id))
+    except ValueError:
+        raise RowError(f"Invalid patient_id: {patient_id!r}")
+
+    value = row.get("value")
+    if value in (None, ""):
+        value = None
+    else:
+        try:
+            value = Decimal(str(value))
+        except InvalidOperation:
+            raise RowError(f"Invalid value: {value!r}")
+        if not value.is_finite():
+            raise RowError("value must be finite")
+
+    unit = row.get("unit") or None
+    if unit is not None and len(str(unit)) > 20:
+        raise RowError("unit longer than 20 characters")
+
+    metadata = row.get("metadata")
+    if metadata is not None and not isinstance(metadata, dict):
+        raise RowError("metadata must be an object")
+
+    return (
+        sample_time,
+        patient_id,
+        _required_text(row, "device_type", 50),
+        _required_text(row, "metric_type", 50),
+        value,
+        str(unit) if unit is not None else None,
+        json.dumps(metadata) if metadata is not None else None
+    )
+
+
+# =============== Loading ===============
+
+async def _known_patients(db: AsyncSession, patient_ids: Set[UUID]) -> Set[UUID]:
+    result = await db.execute(select(Patient.id).where(Patient.id.in_(patient_ids)))
+    return set(result.scalars().all())
+
+
+async def copy_records(db: AsyncSession, records: List[tuple]) -> Dict[datetime, int]:
+    """
+    COPY one chunk into the staging table through the session's asyncpg
+    connection, then move it into wearable_data skipping samples already
+    stored; returns inserted rows per UTC day
+    """
+    await db.execute(text(CREATE_STAGE_SQL))
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        STAGE_TABLE, records=records, columns=COPY_COLUMNS
+    )
+    result = await db.execute(text(MOVE_STAGED_SQL))
+    return {row.day: row.inserted for row in result}
+
+
+class ChunkLoader:
+    """
+    Buffers validated records and writes them one committed chunk at a time
+    """
+
+    def __init__(self, db: AsyncSession, report: IngestReport):
+        self.db = db
+        self.report = report
+        self.pending: List[Tuple[int, tuple]] = []
+        self.known_patients: Set[UUID] = set()
+
+    async def add(self, line: int, record: tuple):
+        self.pending.append((line, record))
+        if len(self.pending) >= settings.WEARABLE_INGEST_CHUNK_ROWS:
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+
+        # One lookup per chunk for patients not seen earlier in this upload
+        unseen = {record[1] for _, record in pending} - self.known_patients
+        if unseen:
+            self.known_patients |= await _known_patients(self.db, unseen)
+
+        records = []
+        for line, record in pending:
+            if record[1] in self.known_patients:
+                records.append(record)
+            else:
+                self.report.reject(line, f"Unknown patient {record[1]}")
+        if not records:
+            return
+
+        inserted_by_day = await self.write(records)
+        # COPY bypasses the ORM, so cached charts are invalidated explicitly
+        await bump_patient_versions(self.db, {record[1] for record in records})
+        await self.db.commit()
+        inserted = sum(inserted_by_day.values())
+        self.report.accepted += len(records)
+        self.report.duplicates += len(records) - inserted
+        self.report.chunks += 1
+        self.report.patient_ids.update(record[1] for record in records)
+        self.report.track_latest(records)
+
+        self.report.refresh_days |= get_storage().days_to_refresh(inserted_by_day)
+
+    async def write(self, records: List[tuple]) -> Dict[datetime, int]:
+        return await copy_records(self.db, records)
+
+
+async def ingest_stream(
+    db: AsyncSession,
+    body: AsyncIterator[bytes],
+    media_type: str,
+    default_patient_id: Optional[UUID] = None,
+    report: Optional[IngestReport] = None
+) -> IngestReport:
+    """
+    Validate and load an NDJSON/CSV byte stream; returns the ingest report
+    (with `aborted` set if the stream itself was unusable part way through).
+    Pass `report` to see which chunks were committed if this raises.
+    """
+    report = report if report is not None else IngestReport()
+    loader = ChunkLoader(db, report)
+
+    try:
+        async for line, raw in iter_rows(iter_lines(body), media_type):
+            if isinstance(raw, str):
+                report.reject(line, raw)
+                continue
+            try:
+                record = parse_row(raw, default_patient_id)
+            except RowError as e:
+                report.reject(line, str(e))
+                continue
+            await loader.add(line, record)
+        await loader.flush()
+    except IngestError as e:
+        # Chunks committed before the failure stay loaded
+        report.aborted = str(e)
+
+    await get_storage().refresh_days(report.refresh_days)
+
+    WEARABLE_INGEST_ROWS.labels(outcome="accepted").inc(report.accepted - report.duplicates)
+    WEARABLE_INGEST_ROWS.labels(outcome="duplicate").inc(report.duplicates)
+    WEARABLE_INGEST_ROWS.labels(outcome="rejected").inc(report.rejected)
+    return report
+
+
+# =============== Idempotency keys ===============
+
+async def claim_batch(db: AsyncSession, key: str, user_id: UUID) -> Optional[Dict[str, Any]]:
+    """
+    Reserve an idempotency key for a new upload. Returns the stored report
+    if the batch already completed; raises BatchConflict if it is still
+    running or was sent by another user.
+    """
+    expired = datetime.now(timezone.utc) - timedelta(hours=settings.WEARABLE_INGEST_IDEMPOTENCY_TTL_HOURS)
+    await db.execute(delete(WearableIngestBatch).where(WearableIngestBatch.created_at < expired))
+
+    result = await db.execute(
+        pg_insert(WearableIngestBatch)
+        .values(idempotency_key=key, user_id=user_id, status="in_progress")
+        .on_conflict_do_nothing(index_elements=[WearableIngestBatch.idempotency_key])
+        .returning(WearableIngestBatch.idempotency_key)
+    )
+    claimed = result.scalar_one_or_none() is not None
+    await db.commit()
+    if claimed:
+        return None
+
+    batch = await db.get(WearableIngestBatch, key)
+    if batch is None or batch.user_id != user_id:
+        raise BatchConflict("Idempotency-Key already used")
+    if batch.status != "completed":
+        raise BatchConflict("A batch with this Idempotency-Key is still being processed")
+    return batch.report
+
+
+async def complete_batch(db: AsyncSession, key: str, report: Dict[str, Any]):
+    await db.execute(
+        update(WearableIngestBatch)
+        .where(WearableIngestBatch.idempotency_key == key)
+        .values(status="completed", report=report, updated_at=func.now())
+    )
+    await db.commit()
+
+
+async def release_batch(db: AsyncSession, key: str):
+    """
+    Free the key of a batch that did not complete so the client can retry;
+    chunks it already loaded are skipped as duplicates on the retry
+    """
+    await db.rollback()
+    await db.execute(delete(WearableIngestBatch).where(WearableIngestBatch.idempotency_key == key))
+    await db.commit()
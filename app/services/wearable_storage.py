@@ -0,0 +1,185 @@
+"""
+Wearable storage backends
+
+With the TimescaleDB extension, wearable_data is a hypertable and
+wearable_daily_avg a continuous aggregate maintained by TimescaleDB policies.
+On plain PostgreSQL, wearable_data is range-partitioned by month and
+wearable_daily_avg is a rollup table refreshed by wearable_daily_refresh()
+(see 003_wearable_data). Tables and columns are the same on both, so only
+the few calls below differ; everything else queries the tables directly.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Set, Tuple
+import logging
+
+from sqlalchemy import func, text
+
+from app.core.config import settings
+from app.core.database import async_engine
+
+logger = logging.getLogger(__name__)
+
+# time_bucket() aligns sub-month buckets to this origin by default; date_bin()
+# needs it explicitly to produce the same buckets
+TIME_BUCKET_ORIGIN = datetime(2000, 1, 3, tzinfo=timezone.utc)
+
+
+def day_ranges(days: Iterable[datetime]) -> List[Tuple[datetime, datetime]]:
+    """
+    Coalesce day buckets into [start, end) ranges of consecutive days
+    """
+    ranges: List[List[datetime]] = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [(start, end) for start, end in ranges]
+
+
+def _retention_days() -> Dict[str, int]:
+    return {
+        "raw_retention_days": settings.WEARABLE_RAW_RETENTION_DAYS,
+        "aggregate_retention_days": settings.WEARABLE_AGGREGATE_RETENTION_DAYS,
+    }
+
+
+class WearableStorage(ABC):
+    name = ""
+    # Whether the app must run maintenance periodically (no database-side jobs)
+    periodic_maintenance = False
+
+    @abstractmethod
+    def time_bucket(self, width: timedelta, column):
+        """
+        SQL expression bucketing `column` into `width`-wide buckets
+        """
+
+    @abstractmethod
+    def days_to_refresh(self, inserted_days: Iterable[datetime]) -> Set[datetime]:
+        """
+        Day buckets that gained rows and will not be refreshed otherwise
+        """
+
+    @abstractmethod
+    async def refresh_days(self, days: Set[datetime]):
+        """
+        Re-materialize only the given wearable_daily_avg day buckets
+        """
+
+    @abstractmethod
+    async def maintain(self, conn) -> Dict:
+        """
+        One maintenance pass inside the caller's transaction
+        """
+
+
+class TimescaleStorage(WearableStorage):
+    name = "timescaledb"
+
+    def time_bucket(self, width: timedelta, column):
+        return func.time_bucket(width, column)
+
+    def days_to_refresh(self, inserted_days: Iterable[datetime]) -> Set[datetime]:
+        # The refresh policy only re-materializes buckets wholly inside its
+        # window; older days that gained rows would otherwise stay stale
+        horizon = datetime.now(timezone.utc) - timedelta(days=settings.WEARABLE_AGGREGATE_POLICY_DAYS)
+        return {day for day in inserted_days if day < horizon}
+
+    async def refresh_days(self, days: Set[datetime]):
+        if not days:
+            return
+        # CALL refresh_continuous_aggregate cannot run inside a transaction
+        async with async_engine.connect() as connection:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            for start, end in day_ranges(days):
+                await connection.execute(
+                    text(
+                        "CALL refresh_continuous_aggregate('wearable_daily_avg', "
+                        "CAST(:start AS timestamptz), CAST(:end AS timestamptz))"
+                    ),
+                    {"start": start, "end": end}
+                )
+
+    async def maintain(self, conn) -> Dict:
+        # TimescaleDB runs the policies itself; this only reinstalls them
+        # with the configured intervals (see 007_wearable_compression)
+        policies = {"compress_after_days": settings.WEARABLE_COMPRESS_AFTER_DAYS, **_retention_days()}
+        await conn.execute(
+            text(
+                "SELECT wearable_apply_policies("
+                "make_interval(days => :compress_after_days), "
+                "make_interval(days => :raw_retention_days), "
+                "make_interval(days => :aggregate_retention_days))"
+            ),
+            policies
+        )
+        return policies
+
+
+class PartitionedStorage(WearableStorage):
+    name = "partitioned"
+    periodic_maintenance = True
+
+    def time_bucket(self, width: timedelta, column):
+        return func.date_bin(width, column, TIME_BUCKET_ORIGIN)
+
+    def days_to_refresh(self, inserted_days: Iterable[datetime]) -> Set[datetime]:
+        # No refresh policy behind the rollup, so every touched day counts
+        return set(inserted_days)
+
+    async def refresh_days(self, days: Set[datetime]):
+        if not days:
+            return
+        async with async_engine.begin() as connection:
+            for start, end in day_ranges(days):
+                await connection.execute(
+                    text("SELECT wearable_daily_refresh(CAST(:start AS timestamptz), CAST(:end AS timestamptz))"),
+                    {"start": start, "end": end}
+                )
+
+    async def maintain(self, conn) -> Dict:
+        retention = _retention_days()
+        oldest_kept = datetime.now(timezone.utc).date() - timedelta(days=settings.WEARABLE_RAW_RETENTION_DAYS)
+        created = await conn.scalar(
+            text("SELECT wearable_data_create_partitions(:from_month, :ahead)"),
+            {"from_month": oldest_kept, "ahead": settings.WEARABLE_PARTITIONS_AHEAD_MONTHS}
+        )
+        result = await conn.execute(
+            text(
+                "SELECT * FROM wearable_enforce_retention("
+                "make_interval(days => :raw_retention_days), "
+                "make_interval(days => :aggregate_retention_days))"
+            ),
+            retention
+        )
+        dropped = list(result.scalars())
+        # Same window the continuous aggregate's refresh policy covers
+        await conn.execute(
+            text("SELECT wearable_daily_refresh(now() - make_interval(days => :days), now())"),
+            {"days": settings.WEARABLE_AGGREGATE_POLICY_DAYS}
+        )
+        return {"created": created, "dropped": dropped, **retention}
+
+
+# TimescaleDB until detect_storage() has run
+_storage: WearableStorage = TimescaleStorage()
+
+
+def get_storage() -> WearableStorage:
+    return _storage
+
+
+async def detect_storage() -> WearableStorage:
+    """
+    Pick the backend from the database's installed extensions
+    """
+    global _storage
+    async with async_engine.connect() as conn:
+        has_timescaledb = await conn.scalar(
+            text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb')")
+        )
+    _storage = TimescaleStorage() if has_timescaledb else PartitionedStorage()
+    logger.info(f"Wearable storage backend: {_storage.name}")
+    return _storage
@@ -0,0 +1,233 @@
+"""
+Wearable series for the health timeline and charts
+
+The source table depends on the requested window: short windows read raw
+wearable_data, medium ones hourly buckets of it and long ones the
+wearable_daily_avg aggregate. Buckets are widened further when
+needed so no metric returns more than WEARABLE_MAX_POINTS_PER_METRIC points.
+Windows reaching back past WEARABLE_RAW_RETENTION_DAYS always read the
+aggregate, which outlives the raw samples.
+Chart series are instead downsampled in NumPy (see app.services.downsampling).
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.database import WearableData, wearable_daily_avg
+from app.services.downsampling import downsample
+from app.services.wearable_storage import get_storage
+
+
+@dataclass(frozen=True)
+class Resolution:
+    name: str
+    bucket: timedelta
+    use_daily_aggregate: bool
+
+
+def raw_retained(start_date: datetime) -> bool:
+    """
+    Whether raw samples are still kept from `start_date` on
+    """
+    if start_date.tzinfo is None:
+        start_date = start_date.replace(tzinfo=timezone.utc)
+    return start_date >= datetime.now(timezone.utc) - timedelta(days=settings.WEARABLE_RAW_RETENTION_DAYS)
+
+
+def pick_resolution(start_date: datetime, end_date: datetime, max_points: Optional[int] = None) -> Resolution:
+    """
+    Tier for the window, with the bucket widened to stay under `max_points`
+    """
+    max_points = max_points or settings.WEARABLE_MAX_POINTS_PER_METRIC
+    span = max(end_date - start_date, timedelta(seconds=1))
+    # Smallest whole-second bucket that keeps the window under the cap
+    capped = timedelta(seconds=-(-span.total_seconds() // max_points))
+
+    if not raw_retained(start_date):
+        return Resolution("daily", max(timedelta(days=1), capped), True)
+    if span <= timedelta(hours=settings.WEARABLE_RAW_MAX_HOURS):
+        return Resolution("raw", capped, False)
+    if span <= timedelta(days=settings.WEARABLE_HOURLY_MAX_DAYS):
+        return Resolution("hourly", max(timedelta(hours=1), capped), False)
+    return Resolution("daily", max(timedelta(days=1), capped), True)
+
+
+def _raw_series_query(patient_id: UUID, start_date: datetime, end_date: datetime, bucket: timedelta):
+    bucket_start = get_storage().time_bucket(bucket, WearableData.time).label("bucket")
+    return (
+        select(
+            WearableData.metric_type,
+            bucket_start,
+            func.avg(WearableData.value).label("avg_value"),
+            func.min(WearableData.value).label("min_value"),
+            func.max(WearableData.value).label("max_value"),
+            func.count(WearableData.value).label("data_points")
+        )
+        .where(
+            WearableData.patient_id == patient_id,
+            WearableData.time >= start_date,
+            WearableData.time <= end_date
+        )
+        .group_by(WearableData.metric_type, bucket_start)
+        .order_by(WearableData.metric_type, bucket_start)
+    )
+
+
+def _daily_series_query(patient_id: UUID, start_date: datetime, end_date: datetime, bucket: timedelta):
+    daily = wearable_daily_avg.c
+    storage = get_storage()
+    bucket_start = storage.time_bucket(bucket, daily.day).label("bucket")
+    # Re-bucketing daily averages must weight each day by its sample count
+    return (
+        select(
+            daily.metric_type,
+            bucket_start,
+            (func.sum(daily.avg_value * daily.data_points) / func.nullif(func.sum(daily.data_points), 0)).label("avg_value"),
+            func.min(daily.min_value).label("min_value"),
+            func.max(daily.max_value).label("max_value"),
+            func.sum(daily.data_points).label("data_points")
+        )
+        .where(
+            daily.patient_id == patient_id,
+            daily.day >= storage.time_bucket(timedelta(days=1), start_date),
+            daily.day <= end_date
+        )
+        .group_by(daily.metric_type, bucket_start)
+        .order_by(daily.metric_type, bucket_start)
+    )
+
+
+def _number(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+async def fetch_wearable_series(
+    db: AsyncSession,
+    patient_id: UUID,
+    start_date: datetime,
+    end_date: datetime,
+    max_points: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Per-metric bucketed series for the window; JSON-ready
+    """
+    resolution = pick_resolution(start_date, end_date, max_points)
+    build_query = _daily_series_query if resolution.use_daily_aggregate else _raw_series_query
+    result = await db.execute(build_query(patient_id, start_date, end_date, resolution.bucket))
+
+    series: Dict[str, List[Dict[str, Any]]] = {}
+    for row in result:
+        series.setdefault(row.metric_type, []).append({
+            "date": row.bucket.isoformat(),
+            "avg": _number(row.avg_value),
+            "min": _number(row.min_value),
+            "max": _number(row.max_value),
+            "count": int(row.data_points)
+        })
+
+    return {
+        "resolution": resolution.name,
+        "bucket_seconds": int(resolution.bucket.total_seconds()),
+        "series": series
+    }
+
+
+# =============== Downsampled chart series ===============
+
+def _raw_points_query(patient_id: UUID, metrics: List[str], start_date: datetime, end_date: datetime):
+    return (
+        select(
+            WearableData.metric_type,
+            cast(func.extract("epoch", WearableData.time), Float),
+            cast(WearableData.value, Float)
+        )
+        .where(
+            WearableData.patient_id == patient_id,
+            WearableData.metric_type.in_(metrics),
+            WearableData.time >= start_date,
+            WearableData.time <= end_date,
+            WearableData.value.isnot(None)
+        )
+        .order_by(WearableData.metric_type, WearableData.time)
+    )
+
+
+def _daily_points_query(patient_id: UUID, metrics: List[str], start_date: datetime, end_date: datetime):
+    daily = wearable_daily_avg.c
+    # One point per day across devices, weighted by each device's sample count
+    return (
+        select(
+            daily.metric_type,
+            cast(func.extract("epoch", daily.day), Float),
+            cast(func.sum(daily.avg_value * daily.data_points) / func.nullif(func.sum(daily.data_points), 0), Float)
+        )
+        .where(
+            daily.patient_id == patient_id,
+            daily.metric_type.in_(metrics),
+            daily.day >= get_storage().time_bucket(timedelta(days=1), start_date),
+            daily.day <= end_date,
+            daily.avg_value.isnot(None)
+        )
+        .group_by(daily.metric_type, daily.day)
+        .order_by(daily.metric_type, daily.day)
+    )
+
+
+def _split_by_metric(rows: Iterable) -> Dict[str, np.ndarray]:
+    """
+    (metric, epoch, value) rows ordered by metric -> {metric: Nx2 float array}
+    """
+    grouped: Dict[str, List] = {}
+    for metric, epoch, value in rows:
+        grouped.setdefault(metric, []).append((epoch, value))
+    return {metric: np.asarray(points, dtype=np.float64) for metric, points in grouped.items()}
+
+
+async def fetch_downsampled_series(
+    db: AsyncSession,
+    patient_id: UUID,
+    metrics: List[str],
+    start_date: datetime,
+    end_date: datetime,
+    points: int,
+    algorithm: str = "lttb"
+) -> Dict[str, Any]:
+    """
+    Chart series per metric, downsampled to at most `points` points.
+
+    Windows up to WEARABLE_SERIES_RAW_MAX_DAYS read raw samples; longer ones,
+    or ones past raw retention, read the wearable_daily_avg aggregate.
+    """
+    use_raw = (
+        end_date - start_date <= timedelta(days=settings.WEARABLE_SERIES_RAW_MAX_DAYS)
+        and raw_retained(start_date)
+    )
+    build_query = _raw_points_query if use_raw else _daily_points_query
+    result = await db.execute(build_query(patient_id, metrics, start_date, end_date))
+    arrays = _split_by_metric(result.tuples())
+
+    series: Dict[str, Any] = {}
+    for metric in metrics:
+        data = arrays.get(metric)
+        if data is None or data.size == 0:
+            series[metric] = {"source_points": 0, "points": []}
+            continue
+        x, y = downsample(data[:, 0], data[:, 1], points, algorithm)
+        # [epoch milliseconds, value] pairs, the shape charting libraries take
+        series[metric] = {
+            "source_points": int(len(data)),
+            "points": np.column_stack(((x * 1000).round(), y)).tolist()
+        }
+
+    return {
+        "patient_id": str(patient_id),
+        "source": "raw" if use_raw else "daily",
+        "algorithm": algorithm,
+        "series": series
+    }
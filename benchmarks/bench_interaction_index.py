@@ -0,0 +1,136 @@
+"""
+Interaction check cost, pairwise loops vs the set-intersection index
+
+Builds a synthetic drug master (combination products, pharmacological
+classes, a few hundred thousand rules) in memory, then checks random
+regimens of --medications drugs plus AYUSH herbs and conditions both ways,
+asserting the results are identical:
+
+    python benchmarks/bench_interaction_index.py --medications 50 --rules 300000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from app.services import interaction_index
+from app.services.drug_knowledge import parse_knowledge_base
+
+
+def _master(args: argparse.Namespace, rng: random.Random) -> bytes:
+    ingredients = [f"ING{n:06d}" for n in range(args.drugs)]
+    classes = [f"class:CLS{n:04d}" for n in range(args.drugs // 50)]
+    drugs = []
+    for n, ingredient in enumerate(ingredients):
+        drug_ingredients = [ingredient] if n % 10 else [ingredient, rng.choice(ingredients)]
+        drugs.append({
+            "generic_name": f"DRUG{n:06d}",
+            "ingredients": drug_ingredients,
+            "classes": [name[len("class:"):] for name in rng.sample(classes, 2)],
+        })
+    terms = ingredients + classes
+    rule = {"severity": "moderate", "description": "synthetic", "recommendation": "monitor"}
+    return json.dumps({
+        "drugs": drugs,
+        "drug_interactions": [
+            dict(rule, drugs=rng.sample(ingredients if n % 20 else terms, 2), description=f"rule {n}")
+            for n in range(args.rules)
+        ],
+        "herb_drug_interactions": [
+            dict(rule, herb=f"HERB{rng.randrange(args.herbs):04d}", drug=rng.choice(terms), description=f"herb rule {n}")
+            for n in range(args.rules // 20)
+        ],
+        "contraindications": [
+            {"drug": rng.choice(terms), "condition": f"condition_{rng.randrange(200)}", "message": f"contraindication {n}"}
+            for n in range(args.rules // 20)
+        ],
+    }).encode()
+
+
+def _pairwise(kb, herbs, names, conditions):
+    """
+    The nested loops the endpoint used, one lookup per pair of terms
+    """
+    drug_drug = []
+    for i, first in enumerate(names):
+        for j in range(i + 1, len(names)):
+            outer, inner = sorted((kb.terms_for(first), kb.terms_for(names[j])))
+            for key in (tuple(sorted((a, b))) for a in outer for b in inner):
+                if key in kb.drug_interactions:
+                    drug_drug.append((i, j, kb.drug_interactions[key]))
+                    break
+    herb_drug = []
+    for h, herb in enumerate(herbs):
+        for m, name in enumerate(names):
+            for term in kb.terms_for(name):
+                if (herb, term) in kb.herb_drug_interactions:
+                    herb_drug.append((h, m, kb.herb_drug_interactions[(herb, term)]))
+                    break
+    contraindicated = []
+    for m, name in enumerate(names):
+        for condition in conditions:
+            for term in kb.terms_for(name):
+                if (term, condition) in kb.contraindications:
+                    contraindicated.append((m, condition, kb.contraindications[(term, condition)]))
+                    break
+    return drug_drug, herb_drug, contraindicated
+
+
+def _indexed(kb, herbs, names, conditions):
+    return (
+        interaction_index.drug_interactions(kb, names),
+        interaction_index.herb_drug_interactions(kb, herbs, names),
+        interaction_index.contraindications(kb, names, conditions),
+    )
+
+
+def main(args: argparse.Namespace):
+    rng = random.Random(42)
+    started = time.perf_counter()
+    kb = parse_knowledge_base(_master(args, rng))
+    print(f"knowledge base: {len(kb.drugs)} drugs, {len(kb.drug_interactions)} drug rules, "
+          f"built in {time.perf_counter() - started:.2f} s")
+
+    names = list(kb.drugs)
+    regimens = [
+        (
+            [f"HERB{rng.randrange(args.herbs):04d}" for _ in range(args.ayush)],
+            rng.sample(names, args.medications),
+            [f"condition_{rng.randrange(200)}" for _ in range(args.conditions)],
+        )
+        for _ in range(args.regimens)
+    ]
+
+    timings = {}
+    for label, check in (("pairwise", _pairwise), ("indexed", _indexed)):
+        samples = []
+        for regimen in regimens:
+            started = time.perf_counter()
+            check(kb, *regimen)
+            samples.append((time.perf_counter() - started) * 1000)
+        timings[label] = samples
+
+    matches = 0
+    for regimen in regimens:
+        expected = _pairwise(kb, *regimen)
+        assert _indexed(kb, *regimen) == expected, regimen
+        matches += sum(len(found) for found in expected)
+
+    print(f"regimens:       {args.regimens} x {args.medications} drugs, {args.ayush} herbs, "
+          f"{args.conditions} conditions; {matches} findings, identical both ways")
+    for label, samples in timings.items():
+        samples.sort()
+        print(f"{label:15} median {statistics.median(samples):.3f} ms, p95 {samples[int(len(samples) * 0.95)]:.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--drugs", type=int, default=20_000)
+    parser.add_argument("--rules", type=int, default=300_000, help="Drug-drug rules; herb and contraindication rules are 1/20 of this")
+    parser.add_argument("--herbs", type=int, default=500)
+    parser.add_argument("--medications", type=int, default=50)
+    parser.add_argument("--ayush", type=int, default=10)
+    parser.add_argument("--conditions", type=int, default=10)
+    parser.add_argument("--regimens", type=int, default=200)
+    main(parser.parse_args())
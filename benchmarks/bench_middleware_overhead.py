@@ -0,0 +1,85 @@
+"""
+Per-request middleware overhead: BaseHTTPMiddleware vs pure ASGI
+
+Drives a trivial Starlette app in-process (no sockets) so the numbers are
+the middleware cost alone:
+
+    python benchmarks/bench_middleware_overhead.py --requests 20000
+"""
+import argparse
+import asyncio
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.core.middleware import RequestMetricsMiddleware
+
+
+async def _ok(request):
+    return PlainTextResponse("ok")
+
+
+def _bare_app() -> Starlette:
+    return Starlette(routes=[Route("/ping", _ok)])
+
+
+def _base_http_app() -> Starlette:
+    app = _bare_app()
+
+    async def add_process_time_header(request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        response.headers["X-Process-Time"] = str(time.time() - start_time)
+        return response
+
+    app.add_middleware(BaseHTTPMiddleware, dispatch=add_process_time_header)
+    return app
+
+
+def _pure_asgi_app() -> Starlette:
+    app = _bare_app()
+    app.add_middleware(RequestMetricsMiddleware)
+    return app
+
+
+async def _drive(app, requests: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/ping", "raw_path": b"/ping",
+        "query_string": b"", "root_path": "", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+async def main(args: argparse.Namespace):
+    bare = await _drive(_bare_app(), args.requests)
+    base_http = await _drive(_base_http_app(), args.requests)
+    pure = await _drive(_pure_asgi_app(), args.requests)
+
+    print(f"no middleware:      {bare * 1e6:8.1f} us/request")
+    print(f"BaseHTTPMiddleware: {base_http * 1e6:8.1f} us/request (+{(base_http - bare) * 1e6:.1f})")
+    print(f"pure ASGI:          {pure * 1e6:8.1f} us/request (+{(pure - bare) * 1e6:.1f})")
+    print(f"saved per request:  {(base_http - pure) * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    asyncio.run(main(parser.parse_args()))
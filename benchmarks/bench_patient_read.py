@@ -0,0 +1,72 @@
+"""
+Concurrent GET /patients/{id} latency benchmark
+
+Runs against a live server so the same script measures any revision:
+
+    python benchmarks/bench_patient_read.py --token $TOKEN --patient-id $PID \\
+        --concurrency 64 --requests 5000
+
+Check out the revision before the AsyncSession port, run it, then run it again
+on the current tree and compare the p99 line.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def _worker(client: httpx.AsyncClient, url: str, count: int, latencies: list, errors: list):
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            response = await client.get(url)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def main(args: argparse.Namespace):
+    url = f"{args.base_url}/api/v1/patients/{args.patient_id}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    headers = {"Authorization": f"Bearer {args.token}"}
+    latencies: list = []
+    errors: list = []
+
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=30.0) as client:
+        # Warm up pools on both sides before measuring
+        await asyncio.gather(*(client.get(url) for _ in range(args.concurrency)))
+
+        per_worker = max(1, args.requests // args.concurrency)
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            _worker(client, url, per_worker, latencies, errors)
+            for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"requests:    {len(latencies)} ({len(errors)} errors)")
+    print(f"concurrency: {args.concurrency}")
+    print(f"throughput:  {len(latencies) / elapsed:.1f} req/s")
+    print(f"mean:        {statistics.mean(latencies) * 1000:.2f} ms")
+    for pct in (50, 95, 99):
+        print(f"p{pct}:         {_percentile(latencies, pct) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--patient-id", required=True)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
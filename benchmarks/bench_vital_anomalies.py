@@ -0,0 +1,87 @@
+"""
+Vital-sign anomaly scoring throughput
+
+Scores synthetic 1 Hz heart-rate series with injected tachycardia episodes
+in-process (no database), so the numbers are the NumPy detector alone, and
+compares a plain per-sample Python loop on a slice of the same data:
+
+    python benchmarks/bench_vital_anomalies.py --samples 1000000 --series 20
+"""
+import argparse
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.vital_anomalies import RULES, detect_episodes
+
+
+def _series(length: int, episodes: int, rng: np.random.Generator):
+    """
+    Resting heart rate with noise and `episodes` 5-minute tachycardia runs
+    """
+    times = np.arange(length, dtype=np.float64)
+    values = 65 + 5 * np.sin(times / 3600) + rng.normal(0, 2, length)
+    for start in rng.integers(3600, max(3601, length - 600), episodes):
+        values[start:start + 300] += 70
+    return times, values
+
+
+def _naive_flags(times, values, rule) -> int:
+    """
+    The same rule evaluated one sample at a time, for comparison
+    """
+    window = settings.WEARABLE_ANOMALY_BASELINE_MINUTES * 60
+    baseline: deque = deque()
+    total = squares = 0.0
+    flagged = 0
+    for t, v in zip(times.tolist(), values.tolist()):
+        while baseline and baseline[0][0] < t - window:
+            _, old = baseline.popleft()
+            total -= old
+            squares -= old * old
+        if len(baseline) >= settings.WEARABLE_ANOMALY_MIN_BASELINE_SAMPLES:
+            mean = total / len(baseline)
+            std = max(math.sqrt(max(squares / len(baseline) - mean * mean, 0.0)), rule.min_std)
+            z = (v - mean) / std
+            if rule.direction * z >= settings.WEARABLE_ANOMALY_Z_THRESHOLD and rule.direction * (v - rule.limit) >= 0:
+                flagged += 1
+        baseline.append((t, v))
+        total += v
+        squares += v * v
+    return flagged
+
+
+def main(args: argparse.Namespace):
+    rng = np.random.default_rng(42)
+    rule = RULES["heart_rate"]
+    per_series = args.samples // args.series
+    series = [_series(per_series, args.episodes, rng) for _ in range(args.series)]
+
+    started = time.perf_counter()
+    episodes = sum(len(detect_episodes(times, values, rule)) for times, values in series)
+    elapsed = time.perf_counter() - started
+    scored = per_series * args.series
+
+    print(f"samples:     {scored} in {args.series} series")
+    print(f"episodes:    {episodes} found ({args.episodes * args.series} injected)")
+    print(f"numpy:       {elapsed * 1000:.1f} ms, {scored / elapsed:,.0f} samples/s")
+
+    if args.naive_samples:
+        times, values = series[0]
+        times, values = times[:args.naive_samples], values[:args.naive_samples]
+        started = time.perf_counter()
+        _naive_flags(times, values, rule)
+        naive = time.perf_counter() - started
+        print(f"python loop: {naive * 1000:.1f} ms for {len(values)} samples, {len(values) / naive:,.0f} samples/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", type=int, default=1_000_000)
+    parser.add_argument("--series", type=int, default=20)
+    parser.add_argument("--episodes", type=int, default=5, help="Injected episodes per series")
+    parser.add_argument("--naive-samples", type=int, default=200_000, help="0 to skip the loop comparison")
+    main(parser.parse_args())
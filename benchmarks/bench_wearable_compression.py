@@ -0,0 +1,154 @@
+"""
+wearable_data storage size and scan time, uncompressed vs compressed
+
+Loads synthetic per-second samples into a scratch hypertable shaped and
+compressed like wearable_data (007_wearable_compression), times the read
+paths before and after compressing every chunk, then drops the table:
+
+    python benchmarks/bench_wearable_compression.py --patients 10 --days 2
+
+Needs DATABASE_URL pointing at a TimescaleDB database the user can create
+tables in; wearable_data itself is not touched.
+"""
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.core.database import async_engine
+
+TABLE = "bench_wearable_data"
+
+# Keep in step with 007_wearable_compression
+COMPRESSION = """
+    ALTER TABLE bench_wearable_data SET (
+        timescaledb.compress,
+        timescaledb.compress_segmentby = 'patient_id, metric_type',
+        timescaledb.compress_orderby = 'time DESC, device_type'
+    )
+"""
+
+# (label, SQL) pairs mirroring the API read paths
+QUERIES = [
+    ("raw series, 1 patient x 6h", """
+        SELECT time, value FROM bench_wearable_data
+        WHERE patient_id = :patient_id AND metric_type = 'heart_rate'
+          AND time >= :end - interval '6 hours' AND time <= :end
+        ORDER BY time
+    """),
+    ("hourly buckets, 1 patient x span", """
+        SELECT metric_type, time_bucket('1 hour', time) AS bucket, avg(value), min(value), max(value), count(value)
+        FROM bench_wearable_data
+        WHERE patient_id = :patient_id AND time >= :start AND time <= :end
+        GROUP BY 1, 2 ORDER BY 1, 2
+    """),
+    ("daily avg, all patients x span", """
+        SELECT patient_id, metric_type, time_bucket('1 day', time) AS day, avg(value)
+        FROM bench_wearable_data
+        WHERE time >= :start AND time <= :end
+        GROUP BY 1, 2, 3
+    """),
+]
+
+
+def _samples(patient_ids, start: datetime, seconds: int, interval: int):
+    """
+    Heart rate every `interval` seconds and steps every minute, per patient
+    """
+    for patient_id in patient_ids:
+        base = random.uniform(60, 80)
+        for offset in range(0, seconds, interval):
+            at = start + timedelta(seconds=offset)
+            heart_rate = base + 8 * math.sin(offset / 3600) + random.gauss(0, 2)
+            yield (at, patient_id, "fitbit", "heart_rate", round(heart_rate, 1), "bpm", None)
+            if offset % 60 == 0:
+                yield (at, patient_id, "fitbit", "steps", random.randint(0, 120), "count", None)
+
+
+async def _size(conn) -> int:
+    return await conn.scalar(text(f"SELECT hypertable_size('{TABLE}')"))
+
+
+async def _time_queries(conn, params: dict, repeat: int) -> dict:
+    timings = {}
+    for label, sql in QUERIES:
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await conn.execute(text(sql), params)
+            runs.append(time.perf_counter() - started)
+        timings[label] = statistics.median(runs)
+    return timings
+
+
+async def main(args: argparse.Namespace):
+    end = datetime.now(timezone.utc).replace(microsecond=0)
+    start = end - timedelta(days=args.days)
+    patient_ids = [uuid.uuid4() for _ in range(args.patients)]
+    params = {"patient_id": patient_ids[0], "start": start, "end": end}
+
+    async with async_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        await conn.execute(text(f"CREATE TABLE {TABLE} (LIKE wearable_data INCLUDING DEFAULTS)"))
+        await conn.execute(text(f"SELECT create_hypertable('{TABLE}', 'time', chunk_time_interval => interval '1 day')"))
+        await conn.execute(text(f"CREATE UNIQUE INDEX ON {TABLE} (patient_id, device_type, metric_type, time)"))
+        await conn.execute(text(f"CREATE INDEX ON {TABLE} (patient_id, time)"))
+        await conn.execute(text(COMPRESSION))
+
+        try:
+            raw = (await conn.get_raw_connection()).driver_connection
+            loaded = 0
+            started = time.perf_counter()
+            # One patient per COPY keeps memory flat
+            for patient_id in patient_ids:
+                rows = list(_samples([patient_id], start, args.days * 86400, args.interval))
+                await raw.copy_records_to_table(
+                    TABLE, records=rows,
+                    columns=("time", "patient_id", "device_type", "metric_type", "value", "unit", "metadata")
+                )
+                loaded += len(rows)
+            print(f"rows:        {loaded} loaded in {time.perf_counter() - started:.1f} s")
+            await conn.execute(text(f"ANALYZE {TABLE}"))
+
+            # Warm the cache so both passes measure scans, not first reads
+            await _time_queries(conn, params, 1)
+            before_size = await _size(conn)
+            before = await _time_queries(conn, params, args.repeat)
+
+            started = time.perf_counter()
+            await conn.execute(text(
+                f"SELECT compress_chunk(c, if_not_compressed => true) FROM show_chunks('{TABLE}') c"
+            ))
+            print(f"compression: {time.perf_counter() - started:.1f} s")
+            await conn.execute(text(f"ANALYZE {TABLE}"))
+
+            await _time_queries(conn, params, 1)
+            after_size = await _size(conn)
+            after = await _time_queries(conn, params, args.repeat)
+        finally:
+            if not args.keep:
+                await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+    print(f"size:        {before_size / 2**20:.1f} MiB -> {after_size / 2**20:.1f} MiB "
+          f"({before_size / max(after_size, 1):.1f}x smaller)")
+    for label, _ in QUERIES:
+        print(f"{label + ':':<36} {before[label] * 1000:8.1f} ms -> {after[label] * 1000:8.1f} ms")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patients", type=int, default=10)
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--interval", type=int, default=1, help="Seconds between heart-rate samples")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Leave the scratch table in place")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,22 @@
+"""
+Gunicorn configuration (picked up automatically from the working directory)
+
+Sets up prometheus_client multiprocess mode so /metrics aggregates every
+worker. The directory must be set before prometheus_client is imported,
+since workers inherit the master's imported modules.
+"""
+import os
+import shutil
+
+_metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/integmed-prometheus")
+
+
+def on_starting(server):
+    # Stale files from a previous master would be summed into new metrics
+    shutil.rmtree(_metrics_dir, ignore_errors=True)
+    os.makedirs(_metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)